@@ -1,15 +1,15 @@
 #!/usr/bin/env python
-
-import sys
+import json
 import logging
+import time
 
 import unittest
-from flask import Flask, cli
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+import click
+from flask import Flask, cli, current_app
 from config import *
 
 from pluto.exceptions.configurations_exceptions import ImproperlyConfigured
+from pluto.extensions import db, migrate
 
 
 ENVS = ['config.DevelopmentConfig', 'config.TestingConfig', 'config.StagingConfig', 'config.ProductionConfig']
@@ -30,40 +30,76 @@ try:
 except ImproperlyConfigured:
     ENV = 'config.DevelopmentConfig'
 
-app = Flask(__name__)
-app.config['ENV'] = ENV
-app.config.from_object(ENV)
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+def create_app(config_object=None):
+    """Builds the app for config_object, by default the one selected by the ENV variable."""
+    started = time.perf_counter()
+    config_object = config_object or ENV
+
+    app = Flask(__name__)
+    app.config['ENV'] = config_object
+    app.config.from_object(config_object)
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+
+    # read replicas
+    from pluto import readReplicas
+    readReplicas.init_app(app)
+
+    # app config
+    if config_object == ENVS[0]:
+        # local development
+        print("*** you should not see this message in production ***")
+
+    # log handler, written by a background thread
+    from pluto import logQueue
+    log_level = logging.INFO if not app.config.get('DEBUG') else logging.DEBUG
+    logQueue.init_app(app, log_level)
 
-# app config
-if ENV == ENVS[0]:
-    # local development
-    print("*** you should not see this message in production ***")
+    # import blueprints
+    from pluto.views import pluto
 
-# log handler
-log_level = logging.INFO if not app.config.get('DEBUG') else logging.DEBUG
-handler = logging.StreamHandler(sys.stdout)
-handler.setLevel(log_level)
-handler.setFormatter(logging.Formatter(
-    '%(asctime)s %(levelname)s: %(message)s '
-    '[in %(pathname)s:%(lineno)d]'
-))
+    # register blueprints
+    app.register_blueprint(pluto, url_prefix='/tax')
 
-for h in app.logger.handlers:
-    app.logger.removeHandler(h)
-app.logger.addHandler(handler)
-app.logger.setLevel(log_level)
+    # metrics and profiling
+    from pluto import metrics, sqlProfiler
+    metrics.init_app(app)
+    sqlProfiler.init_app(app)
 
-# import blueprints
-from pluto.views import pluto
+    # json encoding
+    from pluto import fastJson
+    fastJson.init_app(app)
 
-# register blueprints
-app.register_blueprint(pluto, url_prefix='/tax')
+    # upstream connections, permission cache, auth pool, country catalog, change notifier, rate index and
+    # the shared rate snapshot, per app
+    from pluto import authPool, changeFeed, geoClient, httpSession, permissionCache, rateIndex, rateSnapshot
+    httpSession.init_app(app)
+    permissionCache.init_app(app)
+    authPool.init_app(app)
+    geoClient.init_app(app)
+    changeFeed.init_app(app)
+    rateIndex.init_app(app)
+    rateSnapshot.init_app(app)
 
+    for command in (test, benchmark, compile_rates):
+        app.cli.add_command(command)
 
-@app.cli.command()
+    created = time.perf_counter()
+    app.logger.info(f"created app in {(created - started) * 1000:.0f}ms")
+
+    if app.config.get("WARMUP_ENABLED"):
+        from pluto.warmUp import warm_up
+        timings = warm_up(app)
+        app.logger.info(f"warmed up in {(time.perf_counter() - created) * 1000:.0f}ms (" +
+                        ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()) + ")")
+
+    return app
+
+
+@click.command()
+@cli.with_appcontext
 def test():
     """ Runs the tests without code coverage"""
     tests = unittest.TestLoader().discover('pluto/tests', pattern='*_tests.py')
@@ -73,5 +109,52 @@ def test():
     return 1
 
 
+@click.command()
+@click.option("--requests", default=500, help="recorded requests per endpoint")
+@click.option("--concurrency", default=8, help="client threads per endpoint")
+@click.option("--warmup", default=20, help="unrecorded requests per endpoint")
+@click.option("--guardian-latency", default=5.0, help="latency of the guardian stub in ms")
+@click.option("--geo-latency", default=5.0, help="latency of the geo stub in ms")
+@click.option("--companies", default=10)
+@click.option("--taxes-per-company", default=20)
+@click.option("--rules-per-tax", default=6)
+@click.option("--countries-per-rule", default=4)
+@click.option("--endpoint", "endpoints", multiple=True, help="only benchmark this view function, repeatable")
+@click.option("--cold-auth", is_flag=True, help="ask the guardian stub on every request")
+@click.option("--log-level", default="WARNING", help="level of the app logger during the run")
+@click.option("--output", default="benchmark-results.json", help="json file the results are written to")
+@click.option("--compare", type=click.Path(exists=True), help="earlier result file to compare against")
+@cli.with_appcontext
+def benchmark(output, compare, **options):
+    """ Runs the load benchmark against local guardian and geo stubs"""
+    from benchmarks.suite import run, report
+
+    previous = None
+    if compare:
+        with open(compare) as f:
+            previous = json.load(f)
+
+    result = run(current_app._get_current_object(), **options)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    report(result, previous)
+    print(f"results written to {output}")
+
+
+@click.command("compile-rates")
+@click.option("--output", help="snapshot file, defaults to RATE_SNAPSHOT_PATH")
+@cli.with_appcontext
+def compile_rates(output):
+    """ Compiles the rates of every tax into the snapshot the workers map"""
+    from pluto import rateSnapshot
+
+    path = output or current_app.config.get("RATE_SNAPSHOT_PATH")
+    if not path:
+        raise click.UsageError("set RATE_SNAPSHOT_PATH or pass --output")
+
+    taxes, records = rateSnapshot.compile_snapshot(path)
+    print(f"wrote {taxes} taxes with {records} rates to {path}")
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+"""ASGI entry point, e.g. `uvicorn asgi:application`."""
+
+from app import create_app
+from pluto.asgi import AsgiApp
+
+application = AsgiApp(create_app())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""Times the lookup queries of pluto/views.py with and without the secondary indexes.
+
+Seeds a database with synthetic taxes, rules and countries, drops the non-unique
+indexes of the tax tables, times every query and times them again after the indexes
+were recreated:
+
+    $ python benchmarks/index_benchmark.py --database-url sqlite:////tmp/pluto_bench.db
+    $ python benchmarks/index_benchmark.py --database-url postgresql://postgres:pw@localhost/pluto_bench
+
+The target database must be empty or disposable, its tax tables are dropped first.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+from pluto.extensions import db
+from pluto.models import Tax, TaxRule, TaxRuleCountry
+
+COUNTRIES = ["AT", "BE", "BG", "CY", "CZ", "DE", "DK", "EE", "ES", "FI", "FR", "GR", "HR", "HU", "IE", "IT",
+             "LT", "LU", "LV", "MT", "NL", "PL", "PT", "RO", "SE", "SI", "SK", "GB", "CH", "NO", "US", "CA"]
+
+
+def seed(engine, companies, taxes_per_company, rules_per_tax, countries_per_rule):
+    tables = [Tax.__table__, TaxRule.__table__, TaxRuleCountry.__table__]
+    db.metadata.drop_all(engine, tables=tables)
+    db.metadata.create_all(engine, tables=tables)
+
+    rng = random.Random(42)
+    tax_rows, rule_rows, country_rows = [], [], []
+    tax_id = rule_id = 0
+    for company in range(companies):
+        for _ in range(taxes_per_company):
+            tax_id += 1
+            tax_rows.append({"id": tax_id, "company_id": f"company-{company}", "tax_uuid": uuid.uuid4().hex,
+                             "name": f"tax {tax_id}", "default_tax": 19})
+            used = {True: set(), False: set()}
+            for r in range(rules_per_tax):
+                rule_id += 1
+                b2c = bool(r % 2)
+                rule_rows.append({"id": rule_id, "tax_rule_name": f"rule {rule_id}",
+                                  "tax_rule_uuid": uuid.uuid4().hex, "tax_id": tax_id,
+                                  "value": rng.randint(0, 25), "b2c_rule": b2c})
+                free = [c for c in COUNTRIES if c not in used[b2c]]
+                for country in rng.sample(free, min(countries_per_rule, len(free))):
+                    used[b2c].add(country)
+                    country_rows.append({"tax_rule_id": rule_id, "country_id": country,
+                                         "tax_id": tax_id, "b2c_rule": b2c})
+
+    with engine.begin() as conn:
+        conn.execute(Tax.__table__.insert(), tax_rows)
+        conn.execute(TaxRule.__table__.insert(), rule_rows)
+        conn.execute(TaxRuleCountry.__table__.insert(), country_rows)
+        if engine.dialect.name == "postgresql":
+            for table in tables:
+                conn.execute(f"ANALYZE {table.name}")
+
+    return tax_rows
+
+
+def hot_indexes():
+    return [index for table in (Tax.__table__, TaxRule.__table__, TaxRuleCountry.__table__)
+            for index in table.indexes if not index.unique]
+
+
+def queries(session, taxes, rng):
+    """The lookups of the view functions, each bound to a random tax."""
+
+    def fetch_all_taxes():
+        tax = rng.choice(taxes)
+        rule_count = session.query(func.count(TaxRule.id)).filter(TaxRule.tax_id == Tax.id).correlate(Tax)
+        return session.query(Tax, rule_count.as_scalar()).filter(Tax.company_id == tax["company_id"]).all()
+
+    def fetch_tax_by_id():
+        tax = rng.choice(taxes)
+        return session.query(Tax).filter(Tax.tax_uuid == tax["tax_uuid"])\
+            .filter(Tax.company_id == tax["company_id"]).first()
+
+    def rate_lookup():
+        tax = rng.choice(taxes)
+        return session.query(TaxRule.tax_id, TaxRule.b2c_rule, TaxRuleCountry.country_id, TaxRule.value)\
+            .outerjoin(TaxRuleCountry, TaxRuleCountry.tax_rule_id == TaxRule.id)\
+            .filter(TaxRule.tax_id == tax["id"]).all()
+
+    def rule_configuration():
+        tax = rng.choice(taxes)
+        return session.query(TaxRule.id, TaxRuleCountry.country_id)\
+            .outerjoin(TaxRuleCountry, TaxRuleCountry.tax_rule_id == TaxRule.id)\
+            .filter(TaxRule.tax_id == tax["id"]).filter(TaxRule.b2c_rule.is_(True)).all()
+
+    def country_conflicts():
+        tax = rng.choice(taxes)
+        return session.query(TaxRuleCountry.country_id)\
+            .filter(TaxRuleCountry.tax_id == tax["id"]).filter(TaxRuleCountry.b2c_rule.is_(False))\
+            .filter(TaxRuleCountry.country_id.in_(rng.sample(COUNTRIES, 5))).all()
+
+    return [fetch_all_taxes, fetch_tax_by_id, rate_lookup, rule_configuration, country_conflicts]
+
+
+def measure(engine, taxes, repeat):
+    session = Session(bind=engine)
+    results = {}
+    try:
+        for query in queries(session, taxes, random.Random(7)):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[query.__name__] = {
+                "mean_ms": round(statistics.mean(timings), 4),
+                "p50_ms": round(timings[len(timings) // 2], 4),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 4)
+            }
+    finally:
+        session.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:////tmp/pluto_index_benchmark.db")
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--taxes-per-company", type=int, default=20)
+    parser.add_argument("--rules-per-tax", type=int, default=6)
+    parser.add_argument("--countries-per-rule", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", help="write the results as json to this file")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    taxes = seed(engine, args.companies, args.taxes_per_company, args.rules_per_tax, args.countries_per_rule)
+
+    for index in hot_indexes():
+        index.drop(engine)
+    before = measure(engine, taxes, args.repeat)
+
+    for index in hot_indexes():
+        index.create(engine)
+    after = measure(engine, taxes, args.repeat)
+
+    print(f"{'query':<22}{'before p50 ms':>16}{'after p50 ms':>16}{'speedup':>10}")
+    for name in before:
+        speedup = before[name]["p50_ms"] / after[name]["p50_ms"] if after[name]["p50_ms"] else float("inf")
+        print(f"{name:<22}{before[name]['p50_ms']:>16.3f}{after[name]['p50_ms']:>16.3f}{speedup:>9.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"database": engine.dialect.name, "taxes": len(taxes), "before": before, "after": after},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Closed-loop load driver: a fixed number of threads sends requests back to back."""
+import threading
+import time
+
+import requests
+
+
+def percentile(timings, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not timings:
+        return None
+    return timings[max(0, min(len(timings) - 1, int(round(fraction * len(timings))) - 1))]
+
+
+def drive(base_url, build_request, count, concurrency, warmup=0, headers=None):
+    """Sends `warmup` unrecorded and then `count` recorded requests with `concurrency` threads.
+
+    `build_request(n)` returns (method, path, keyword arguments of requests) for the n-th request,
+    n is unique over the warmup and the recorded requests.
+    """
+    lock = threading.Lock()
+    timings = []
+    status_codes = {}
+
+    def worker(numbers, record):
+        session = requests.Session()
+        session.headers.update(headers or {})
+        try:
+            while True:
+                with lock:
+                    n = next(numbers, None)
+                if n is None:
+                    return
+                method, path, kwargs = build_request(n)
+                start = time.perf_counter()
+                try:
+                    status = session.request(method, base_url + path, **kwargs).status_code
+                except requests.RequestException:
+                    status = "connection_error"
+                elapsed = (time.perf_counter() - start) * 1000
+                if record:
+                    with lock:
+                        timings.append(elapsed)
+                        status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+        finally:
+            session.close()
+
+    worker(iter(range(warmup)), False)
+
+    numbers = iter(range(warmup, warmup + count))
+    threads = [threading.Thread(target=worker, args=(numbers, True)) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    timings.sort()
+    errors = sum(n for status, n in status_codes.items() if not status.isdigit() or int(status) >= 500)
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "status_codes": status_codes,
+        "duration_s": round(duration, 4),
+        "throughput_rps": round(len(timings) / duration, 2) if duration else None,
+        "mean_ms": round(sum(timings) / len(timings), 3) if timings else None,
+        "p50_ms": round(percentile(timings, 0.50), 3) if timings else None,
+        "p95_ms": round(percentile(timings, 0.95), 3) if timings else None,
+        "p99_ms": round(percentile(timings, 0.99), 3) if timings else None,
+        "max_ms": round(timings[-1], 3) if timings else None
+    }
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic tax data for the benchmark, kept apart in companies of its own."""
+import random
+import uuid
+
+from pluto.models import Tax, TaxChange, TaxRule, TaxRuleCountry, db
+from benchmarks.stubs import COUNTRIES
+
+
+class BenchData:
+    """Company ids, taxes and rules created for one benchmark run."""
+
+    def __init__(self, run_id):
+        self.prefix = f"bench-{run_id}-"
+        self.companies = []
+        self.taxes = []
+        self.rules = []
+        self.disposable_company = self.prefix + "disposable"
+        self.disposable = []
+
+    @property
+    def all_companies(self):
+        return self.companies + [self.disposable_company]
+
+
+def _insert_taxes(company_id, count, name):
+    rows = [{"company_id": company_id, "tax_uuid": uuid.uuid4().hex, "name": f"{name} {n}", "default_tax": 19}
+            for n in range(count)]
+    if rows:
+        db.session.execute(Tax.__table__.insert(), rows)
+    ids = dict(db.session.query(Tax.tax_uuid, Tax.id).filter(Tax.company_id == company_id))
+    return [(ids[row["tax_uuid"]], row["tax_uuid"]) for row in rows]
+
+
+def _insert_rules(rows):
+    if not rows:
+        return {}
+    db.session.execute(TaxRule.__table__.insert(), rows)
+    return dict(db.session.query(TaxRule.tax_rule_uuid, TaxRule.id).filter(
+        TaxRule.tax_rule_uuid.in_([row["tax_rule_uuid"] for row in rows])))
+
+
+def seed(run_id, companies, taxes_per_company, rules_per_tax, countries_per_rule, disposable, rng_seed=42):
+    """Creates the read data set and `disposable` taxes with one rule each for the delete endpoints."""
+    rng = random.Random(rng_seed)
+    data = BenchData(run_id)
+
+    for n in range(companies):
+        company_id = f"{data.prefix}{n}"
+        data.companies.append(company_id)
+
+        rule_rows, rule_countries = [], []
+        for tax_id, tax_uuid in _insert_taxes(company_id, taxes_per_company, "bench tax"):
+            used = {True: set(), False: set()}
+            for r in range(rules_per_tax):
+                b2c = bool(r % 2)
+                rule_uuid = uuid.uuid4().hex
+                free = [country for country in COUNTRIES if country not in used[b2c]]
+                countries = rng.sample(free, min(countries_per_rule, len(free)))
+                used[b2c].update(countries)
+
+                rule_rows.append({"tax_rule_name": f"bench rule {r}", "tax_rule_uuid": rule_uuid, "tax_id": tax_id,
+                                  "value": rng.randint(0, 25), "b2c_rule": b2c})
+                rule_countries.append((rule_uuid, tax_id, b2c, countries))
+                data.rules.append({"company_id": company_id, "tax_id": tax_uuid, "rule_id": rule_uuid,
+                                   "b2c_rule": b2c, "countries": countries})
+            data.taxes.append({"company_id": company_id, "tax_id": tax_uuid})
+
+        rule_ids = _insert_rules(rule_rows)
+        country_rows = [{"tax_rule_id": rule_ids[rule_uuid], "country_id": country, "tax_id": tax_id, "b2c_rule": b2c}
+                        for rule_uuid, tax_id, b2c, countries in rule_countries for country in countries]
+        if country_rows:
+            db.session.execute(TaxRuleCountry.__table__.insert(), country_rows)
+
+    rule_rows = []
+    for tax_id, tax_uuid in _insert_taxes(data.disposable_company, disposable, "disposable tax"):
+        rule_uuid = uuid.uuid4().hex
+        rule_rows.append({"tax_rule_name": "disposable rule", "tax_rule_uuid": rule_uuid, "tax_id": tax_id,
+                          "value": 1, "b2c_rule": False})
+        data.disposable.append({"company_id": data.disposable_company, "tax_id": tax_uuid, "rule_id": rule_uuid})
+    _insert_rules(rule_rows)
+
+    db.session.commit()
+    return data
+
+
+def cleanup(data):
+    """Removes everything stored for the benchmark companies, including taxes created during the run."""
+    tax_ids = db.session.query(Tax.id).filter(Tax.company_id.in_(data.all_companies))
+    rule_ids = db.session.query(TaxRule.id).filter(TaxRule.tax_id.in_(tax_ids.subquery()))
+
+    TaxRuleCountry.query.filter(TaxRuleCountry.tax_rule_id.in_(rule_ids.subquery()))\
+        .delete(synchronize_session=False)
+    TaxRule.query.filter(TaxRule.tax_id.in_(tax_ids.subquery())).delete(synchronize_session=False)
+    Tax.query.filter(Tax.company_id.in_(data.all_companies)).delete(synchronize_session=False)
+    TaxChange.query.filter(TaxChange.company_id.in_(data.all_companies)).delete(synchronize_session=False)
+    db.session.commit()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Local stand-ins for the Guardian and geo services with a configurable latency."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+COUNTRIES = ["AT", "BE", "BG", "CY", "CZ", "DE", "DK", "EE", "ES", "FI", "FR", "GR", "HR", "HU", "IE", "IT",
+             "LT", "LU", "LV", "MT", "NL", "PL", "PT", "RO", "SE", "SI", "SK", "GB", "CH", "NO", "US", "CA"]
+
+GEO_ETAG = '"bench-countries"'
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        stubs = self.server.stubs
+        if self.path.startswith("/guardian/"):
+            stubs.count("guardian")
+            time.sleep(stubs.guardian_latency)
+            self._send(200, {"status": "OK", "data": {"user_permission": 1}})
+        elif self.path.startswith("/geo"):
+            stubs.count("geo")
+            time.sleep(stubs.geo_latency)
+            if self.headers.get("If-None-Match") == GEO_ETAG:
+                self._send(304, None)
+            else:
+                self._send(200, [{"id": country} for country in COUNTRIES], {"ETag": GEO_ETAG})
+        else:
+            self._send(404, {"status": "ERROR"})
+
+    def _send(self, status, data, headers=None):
+        body = json.dumps(data).encode() if data is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Stubs:
+    """Runs both stubs on one local port, latencies are given in milliseconds."""
+
+    def __init__(self, guardian_latency=0, geo_latency=0):
+        self.guardian_latency = guardian_latency / 1000
+        self.geo_latency = geo_latency / 1000
+        self.calls = {"guardian": 0, "geo": 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def count(self, service):
+        with self._lock:
+            self.calls[service] += 1
+
+    def start(self):
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stubs = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self._server.server_address[1])
+
+    @property
+    def guardian_url(self):
+        return self.url + "/guardian"
+
+    @property
+    def geo_url(self):
+        return self.url + "/geo"
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Load benchmark of every endpoint of pluto/views.py, started with `flask benchmark`.
+
+The app is served in-process by a threaded werkzeug server against the configured database
+and local Guardian and geo stubs. All data lives in companies named bench-<run id>-*,
+which are removed again when the run ends.
+"""
+import json
+import logging
+import platform
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks.load import drive
+from benchmarks.seed import cleanup, seed
+from benchmarks.stubs import COUNTRIES, Stubs
+from pluto.models import db
+from pluto.rateIndex import rate_index
+
+HEADERS = {"x-user-id": "1", "x-user-uuid": "bench-user", "x-transactionid": "bench"}
+BATCH_ITEMS = 20
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log(self, *args):
+        pass
+
+
+def scenarios(data):
+    """Request builders per view function, in the order they run; the deletes come last."""
+    taxes, rules, disposable = data.taxes, data.rules, data.disposable
+    taxes_by_company = {}
+    for tax in taxes:
+        taxes_by_company.setdefault(tax["company_id"], []).append(tax["tax_id"])
+
+    def pick(items, n):
+        return items[n % len(items)]
+
+    def batch(n):
+        tax = pick(taxes, n)
+        items = [{"tax_id": tax_id, "country": pick(COUNTRIES, n + k), "tax_option": "b2c" if k % 2 else "b2b"}
+                 for k, tax_id in enumerate(taxes_by_company[tax["company_id"]][:BATCH_ITEMS])]
+        return "POST", f"/tax/test/batch/{tax['company_id']}", {"json": {"items": items}}
+
+    def calculate(n):
+        tax = pick(taxes, n)
+        items = [{"tax_id": tax_id, "country": pick(COUNTRIES, n + k), "tax_option": "b2c" if k % 2 else "b2b",
+                  "net_amount": f"{n + k}.99"}
+                 for k, tax_id in enumerate(taxes_by_company[tax["company_id"]][:BATCH_ITEMS])]
+        return "POST", f"/tax/calculate/{tax['company_id']}", {"json": {"items": items}}
+
+    def edit_rule(n):
+        rule = pick(rules, n)
+        body = {"rule_name": "bench rule", "value": 7, "b2c_rule": rule["b2c_rule"],
+                "b2c_countries" if rule["b2c_rule"] else "countries": rule["countries"]}
+        return "PUT", f"/tax/{rule['tax_id']}/create/rule/{rule['company_id']}?tax_rule_id={rule['rule_id']}", \
+            {"json": body}
+
+    def import_document(n):
+        tax = pick(taxes, n)
+        document = "\n".join(json.dumps(line) for line in [
+            {"type": "tax", "tax_id": "t", "name": f"bench import {n}", "default_tax": "19"},
+            {"type": "rule", "tax_id": "t", "name": "b2b", "value": "0", "b2c_rule": False,
+             "countries": [pick(COUNTRIES, n)]},
+            {"type": "rule", "tax_id": "t", "name": "fallback", "value": "7", "b2c_rule": True}
+        ])
+        return "POST", f"/tax/import/{tax['company_id']}", \
+            {"data": document, "headers": {"Content-Type": "application/x-ndjson"}}
+
+    return OrderedDict([
+        ("test", lambda n: ("GET", "/tax/ping", {})),
+        ("upstream_stats", lambda n: ("GET", "/metrics/upstream", {})),
+        ("test_tax_configuration", lambda n: (
+            "POST", "/tax/test/{tax_id}/{company_id}".format(**pick(taxes, n)),
+            {"json": {"tax_option": "b2c" if n % 2 else "b2b", "country": pick(COUNTRIES, n)}})),
+        ("test_tax_configuration_batch", batch),
+        ("calculate_taxes", calculate),
+        ("fetch_all_taxes", lambda n: ("GET", "/tax/all/{company_id}".format(**pick(taxes, n)), {})),
+        ("fetch_tax_by_id", lambda n: ("GET", "/tax/{tax_id}/{company_id}".format(**pick(taxes, n)), {})),
+        ("fetch_tax_configuration", lambda n: (
+            "GET", "/tax/rule/configuration/data/{tax_id}/{company_id}".format(**pick(taxes, n)), {})),
+        ("fetch_tax_rules", lambda n: ("GET", "/tax/rules/{tax_id}/{company_id}".format(**pick(taxes, n)), {})),
+        ("fetch_tax_rule_by_id", lambda n: (
+            "GET", "/tax/rule/{rule_id}/{tax_id}/{company_id}".format(**pick(rules, n)), {})),
+        ("fetch_changes", lambda n: ("GET", "/tax/changes/{company_id}".format(**pick(taxes, n)), {})),
+        ("export_taxes", lambda n: ("GET", "/tax/export/{company_id}".format(**pick(taxes, n)), {})),
+        ("add_rule_to_tax", edit_rule),
+        ("create_tax", lambda n: (
+            "POST", "/tax/create/{company_id}".format(**pick(taxes, n)),
+            {"json": {"tax_name": f"bench created {n}", "default_tax": 19}})),
+        ("edit_tax", lambda n: (
+            "POST", "/tax/edit/{company_id}/{tax_id}".format(**pick(taxes, n)),
+            {"json": {"tax_name": f"bench tax edited {n}", "default_tax": 20}})),
+        ("import_taxes", import_document),
+        ("delete_tax_group", lambda n: (
+            "DELETE", "/tax/delete/taxgroup/{tax_id}/{rule_id}/{company_id}".format(**disposable[n]), {})),
+        ("delete_tax", lambda n: ("DELETE", "/tax/delete/{tax_id}/{company_id}".format(**disposable[n]), {}))
+    ])
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL)\
+            .decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(app, requests, concurrency, warmup, guardian_latency, geo_latency, companies, taxes_per_company,
+        rules_per_tax, countries_per_rule, endpoints=None, cold_auth=False, log_level="WARNING"):
+    """Seeds, drives every selected endpoint and cleans up. Returns the result document."""
+    run_id = uuid.uuid4().hex[:8]
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    overrides = {"GUARDIAN_SERVICE": None, "GEOSERVICE": None}
+    if cold_auth:
+        overrides.update(PERMISSION_CACHE_TTL=0, PERMISSION_CACHE_NEGATIVE_TTL=0)
+    saved_config = {key: app.config.get(key) for key in overrides}
+    saved_log_level = app.logger.level
+
+    stubs = Stubs(guardian_latency, geo_latency).start()
+    overrides.update(GUARDIAN_SERVICE=stubs.guardian_url, GEOSERVICE=stubs.geo_url)
+    app.config.update(overrides)
+    app.logger.setLevel(getattr(logging, log_level.upper()))
+    rate_index.clear()
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = "http://127.0.0.1:{}".format(server.server_port)
+
+    data = None
+    results = OrderedDict()
+    try:
+        data = seed(run_id, companies, taxes_per_company, rules_per_tax, countries_per_rule,
+                    disposable=warmup + requests)
+        db.session.remove()
+
+        for name, build_request in scenarios(data).items():
+            if endpoints and name not in endpoints:
+                continue
+            results[name] = drive(base_url, build_request, requests, concurrency, warmup, HEADERS)
+            app.logger.warning(f"benchmark {name}: {results[name]['throughput_rps']} req/s")
+    finally:
+        server.shutdown()
+        server.server_close()
+        stubs.stop()
+        if data is not None:
+            cleanup(data)
+        app.config.update(saved_config)
+        app.logger.setLevel(saved_log_level)
+
+    return {
+        "meta": {
+            "run_id": run_id,
+            "git_commit": _git_commit(),
+            "started_at": started_at,
+            "python": platform.python_version(),
+            "database": db.engine.dialect.name,
+            "requests": requests,
+            "concurrency": concurrency,
+            "warmup": warmup,
+            "guardian_latency_ms": guardian_latency,
+            "geo_latency_ms": geo_latency,
+            "cold_auth": cold_auth,
+            "data": {"companies": companies, "taxes_per_company": taxes_per_company,
+                     "rules_per_tax": rules_per_tax, "countries_per_rule": countries_per_rule},
+            "upstream_calls": dict(stubs.calls)
+        },
+        "endpoints": results
+    }
+
+
+def report(result, previous=None):
+    """Prints the result, next to the change against a previous result file if given."""
+    header = f"{'endpoint':<30}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    print(header + ("    p50 / p95 change" if previous else ""))
+
+    for name, stats in result["endpoints"].items():
+        line = f"{name:<30}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}" \
+               f"{stats['p99_ms']:>10.2f}{stats['errors']:>8}"
+        before = (previous or {}).get("endpoints", {}).get(name)
+        if before and before.get("p50_ms") and before.get("p95_ms"):
+            line += f"    {(stats['p50_ms'] / before['p50_ms'] - 1) * 100:+.1f}% / " \
+                    f"{(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
@@ -17,12 +17,110 @@ class Config(object):
     GUARDIAN_SERVICE = os.environ.get("GUARDIAN_SERVICE_URL")
     GEOSERVICE = os.environ.get("GEOSERVICE_URL")
 
+    # compiled rate lookups of POST /tax/test, entries of other workers expire after the ttl (seconds)
+    RATE_INDEX_TTL = int(os.environ.get("RATE_INDEX_TTL", 60))
+    RATE_INDEX_SIZE = int(os.environ.get("RATE_INDEX_SIZE", 10000))
+    RATE_BATCH_MAX_ITEMS = int(os.environ.get("RATE_BATCH_MAX_ITEMS", 1000))
+
+    # POST /tax/calculate: line items per call and the rounding of each line's tax amount, both can be
+    # overridden per request
+    CALCULATION_MAX_ITEMS = int(os.environ.get("CALCULATION_MAX_ITEMS", 10000))
+    CALCULATION_MAX_ERRORS = int(os.environ.get("CALCULATION_MAX_ERRORS", 50))
+    CALCULATION_DECIMAL_PLACES = int(os.environ.get("CALCULATION_DECIMAL_PLACES", 2))
+    CALCULATION_ROUNDING = os.environ.get("CALCULATION_ROUNDING", "ROUND_HALF_UP")
+
+    # read-only snapshot of all rates written by `flask compile-rates`, checked for a newer file every interval
+    # and not used once it is older than the max age (seconds)
+    RATE_SNAPSHOT_PATH = os.environ.get("RATE_SNAPSHOT_PATH")
+    RATE_SNAPSHOT_CHECK_INTERVAL = float(os.environ.get("RATE_SNAPSHOT_CHECK_INTERVAL", 5))
+    RATE_SNAPSHOT_MAX_AGE = int(os.environ.get("RATE_SNAPSHOT_MAX_AGE", 86400))
+
+    # fill the country catalog and the rate index (at most WARMUP_RATE_TAXES taxes) when the app is created
+    WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "false").lower() == "true"
+    WARMUP_RATE_TAXES = int(os.environ.get("WARMUP_RATE_TAXES", 10000))
+
+    # guardian permission results per (user, company), denials (401/404) are kept for the negative ttl
+    PERMISSION_CACHE_SIZE = int(os.environ.get("PERMISSION_CACHE_SIZE", 10000))
+    PERMISSION_CACHE_TTL = int(os.environ.get("PERMISSION_CACHE_TTL", 30))
+    PERMISSION_CACHE_NEGATIVE_TTL = int(os.environ.get("PERMISSION_CACHE_NEGATIVE_TTL", 5))
+    # ask guardian on every create, edit and delete request
+    PERMISSION_CACHE_BYPASS_WRITES = os.environ.get("PERMISSION_CACHE_BYPASS_WRITES", "false").lower() == "true"
+
+    # keep-alive connection pool shared by the guardian and geo clients, timeouts in seconds
+    UPSTREAM_POOL_CONNECTIONS = int(os.environ.get("UPSTREAM_POOL_CONNECTIONS", 4))
+    UPSTREAM_POOL_MAXSIZE = int(os.environ.get("UPSTREAM_POOL_MAXSIZE", 20))
+    UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 1.0))
+    UPSTREAM_READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", 3.0))
+    UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", 2))
+    UPSTREAM_RETRY_BACKOFF = float(os.environ.get("UPSTREAM_RETRY_BACKOFF", 0.1))
+
+    # opt-in: run the guardian call of the read endpoints next to their database query on a bounded thread pool,
+    # the query then also runs for callers that turn out to be unauthorized
+    CONCURRENT_AUTH_ENABLED = os.environ.get("CONCURRENT_AUTH_ENABLED", "false").lower() == "true"
+    CONCURRENT_AUTH_WORKERS = int(os.environ.get("CONCURRENT_AUTH_WORKERS", 8))
+
+    # asgi mode (asgi.py): threads running the flask views and connections of the async guardian client
+    ASGI_WSGI_WORKERS = int(os.environ.get("ASGI_WSGI_WORKERS", 32))
+    ASGI_UPSTREAM_MAX_CONNECTIONS = int(os.environ.get("ASGI_UPSTREAM_MAX_CONNECTIONS", 100))
+
+    # log records are written to stdout by a background thread, records beyond the queue size are dropped
+    # and counted; LOG_FORMAT is "text" or "json" and info lines are kept for the given share of requests
+    LOG_QUEUE_ENABLED = os.environ.get("LOG_QUEUE_ENABLED", "true").lower() == "true"
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+    LOG_INFO_SAMPLE_RATE = float(os.environ.get("LOG_INFO_SAMPLE_RATE", 1.0))
+
+    # prometheus metrics of this process at /metrics, its upstream connection pools at /metrics/upstream
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+    # opt-in statement profiling, logs requests over the budget and every statement slower than SQL_SLOW_QUERY_MS
+    SQL_PROFILING_ENABLED = os.environ.get("SQL_PROFILING_ENABLED", "false").lower() == "true"
+    SQL_PROFILE_QUERY_BUDGET = int(os.environ.get("SQL_PROFILE_QUERY_BUDGET", 10))
+    SQL_PROFILE_TIME_BUDGET_MS = float(os.environ.get("SQL_PROFILE_TIME_BUDGET_MS", 100))
+    SQL_SLOW_QUERY_MS = float(os.environ.get("SQL_SLOW_QUERY_MS", 50))
+    SQL_SLOW_QUERY_PARAMETER_LENGTH = int(os.environ.get("SQL_SLOW_QUERY_PARAMETER_LENGTH", 1000))
+
+    # response encoding: auto picks orjson when installed, numeric columns are written as json numbers
+    # ("float") or as exact decimal strings ("string")
+    JSON_BACKEND = os.environ.get("JSON_BACKEND", "auto")
+    JSON_DECIMAL_MODE = os.environ.get("JSON_DECIMAL_MODE", "float")
+
+    # country catalog of the geo service, revalidated after the ttl (seconds) and optionally kept on disk
+    GEO_CATALOG_TTL = int(os.environ.get("GEO_CATALOG_TTL", 3600))
+    GEO_CATALOG_SNAPSHOT = os.environ.get("GEO_CATALOG_SNAPSHOT")
+
+    # keyset pages of GET /tax/all, also the batch size when the list is streamed
+    TAX_PAGE_SIZE = int(os.environ.get("TAX_PAGE_SIZE", 100))
+    TAX_PAGE_SIZE_MAX = int(os.environ.get("TAX_PAGE_SIZE_MAX", 1000))
+
+    # change feed of GET /tax/changes: page sizes, the longest long-poll (seconds), how often a waiting request
+    # re-reads for changes of other workers and how many requests of a process may wait at once, each holds
+    # a worker thread; keep it well below the threads of a worker (or ASGI_WSGI_WORKERS)
+    CHANGE_FEED_PAGE_SIZE = int(os.environ.get("CHANGE_FEED_PAGE_SIZE", 100))
+    CHANGE_FEED_PAGE_SIZE_MAX = int(os.environ.get("CHANGE_FEED_PAGE_SIZE_MAX", 1000))
+    CHANGE_FEED_MAX_WAIT = float(os.environ.get("CHANGE_FEED_MAX_WAIT", 30))
+    CHANGE_FEED_POLL_INTERVAL_MS = int(os.environ.get("CHANGE_FEED_POLL_INTERVAL_MS", 1000))
+    CHANGE_FEED_MAX_WAITERS = int(os.environ.get("CHANGE_FEED_MAX_WAITERS", 4))
+
+    # reads of a transaction id or of a user in a company stay on the primary for this many seconds after it
+    # wrote, should cover the replication lag
+    REPLICA_STICKY_SECONDS = float(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
+    # bulk export and import of a company's tax configuration
+    EXPORT_YIELD_PER = int(os.environ.get("EXPORT_YIELD_PER", 1000))
+    IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 500))
+    IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", 50))
+    IMPORT_SPOOL_MEMORY = int(os.environ.get("IMPORT_SPOOL_MEMORY", 1024 * 1024))
+
 
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.environ.get("FLASK_SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    # comma separated read replicas of DATABASE_URL, used by the read-only views
+    SQLALCHEMY_BINDS = {f"replica_{number}": url for number, url in enumerate(
+        url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip())}
 
 
 class StagingConfig(Config):
@@ -0,0 +1,23 @@
+"""index company taxes by id for keyset pagination
+
+Revision ID: 42d3a4d6b759
+Revises: e73db247a99c
+Create Date: 2026-10-18 11:58:26.114820
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '42d3a4d6b759'
+down_revision = 'e73db247a99c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_accounting_taxes_company_id_id', 'accounting_taxes', ['company_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_accounting_taxes_company_id_id', table_name='accounting_taxes')
@@ -0,0 +1,35 @@
+"""add the change log of taxes read by the change feed
+
+Revision ID: 57a8573aab78
+Revises: 80a23ef5f6c8
+Create Date: 2026-10-18 14:21:07.846512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '57a8573aab78'
+down_revision = '80a23ef5f6c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('accounting_tax_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.String(length=250), nullable=False),
+    sa.Column('tax_uuid', sa.String(length=250), nullable=False),
+    sa.Column('tax_rule_uuid', sa.String(length=250), nullable=True),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_accounting_tax_changes_company_id_id', 'accounting_tax_changes', ['company_id', 'id'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_accounting_tax_changes_company_id_id', table_name='accounting_tax_changes')
+    op.drop_table('accounting_tax_changes')
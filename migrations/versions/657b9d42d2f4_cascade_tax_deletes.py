@@ -0,0 +1,38 @@
+"""delete rules and countries with their tax through ON DELETE CASCADE
+
+Revision ID: 657b9d42d2f4
+Revises: 57a8573aab78
+Create Date: 2026-10-18 15:37:12.204981
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '657b9d42d2f4'
+down_revision = '57a8573aab78'
+branch_labels = None
+depends_on = None
+
+FOREIGN_KEYS = [
+    ('accounting_tax_rules', 'accounting_tax_rules_tax_id_fkey', 'accounting_taxes', 'tax_id'),
+    ('rel_accounting_tax_rule_2_countries', 'rel_accounting_tax_rule_2_countries_tax_rule_id_fkey',
+     'accounting_tax_rules', 'tax_rule_id'),
+    ('rel_accounting_tax_rule_2_countries', 'rel_accounting_tax_rule_2_countries_tax_id_fkey',
+     'accounting_taxes', 'tax_id'),
+]
+
+
+def _replace_foreign_keys(ondelete):
+    for table, name, referred_table, column in FOREIGN_KEYS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred_table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
@@ -0,0 +1,25 @@
+"""add a version counter to taxes for conditional requests
+
+Revision ID: 80a23ef5f6c8
+Revises: 42d3a4d6b759
+Create Date: 2026-10-18 13:02:41.508337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '80a23ef5f6c8'
+down_revision = '42d3a4d6b759'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('accounting_taxes', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('accounting_taxes') as batch_op:
+        batch_op.drop_column('version')
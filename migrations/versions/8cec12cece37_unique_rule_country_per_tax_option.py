@@ -0,0 +1,73 @@
+"""unique rule country per tax and b2c option
+
+Revision ID: 8cec12cece37
+Revises: c021442e9d35
+Create Date: 2026-10-18 09:47:05.902117
+
+Copies tax_id and b2c_rule of the owning rule onto every country row, so the
+database can reject a country that is used twice for the same tax and option.
+Rows that already violate this are removed, keeping the oldest one; every
+removed row is logged.
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.env')
+
+
+# revision identifiers, used by Alembic.
+revision = '8cec12cece37'
+down_revision = 'c021442e9d35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('rel_accounting_tax_rule_2_countries') as batch_op:
+        batch_op.add_column(sa.Column('tax_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('b2c_rule', sa.Boolean(), nullable=True))
+
+    op.execute(
+        "UPDATE rel_accounting_tax_rule_2_countries SET "
+        "tax_id = (SELECT r.tax_id FROM accounting_tax_rules r "
+        "WHERE r.id = rel_accounting_tax_rule_2_countries.tax_rule_id), "
+        "b2c_rule = (SELECT r.b2c_rule FROM accounting_tax_rules r "
+        "WHERE r.id = rel_accounting_tax_rule_2_countries.tax_rule_id)"
+    )
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT DISTINCT c.id, c.tax_rule_id, c.tax_id, c.b2c_rule, c.country_id "
+        "FROM rel_accounting_tax_rule_2_countries c "
+        "JOIN rel_accounting_tax_rule_2_countries d ON d.tax_id = c.tax_id "
+        "AND d.b2c_rule = c.b2c_rule AND d.country_id = c.country_id AND d.id < c.id "
+        "ORDER BY c.id"
+    )).fetchall()
+    for row_id, tax_rule_id, tax_id, b2c_rule, country_id in duplicates:
+        logger.warning(f"removing rule country {row_id} ({country_id} of rule {tax_rule_id}), tax {tax_id} "
+                       f"already uses it for b2c_rule={bool(b2c_rule)}")
+    if duplicates:
+        logger.warning(f"removed {len(duplicates)} duplicate rule countries")
+
+    op.execute(
+        "DELETE FROM rel_accounting_tax_rule_2_countries WHERE id IN ("
+        "SELECT c.id FROM rel_accounting_tax_rule_2_countries c "
+        "JOIN rel_accounting_tax_rule_2_countries d ON d.tax_id = c.tax_id "
+        "AND d.b2c_rule = c.b2c_rule AND d.country_id = c.country_id AND d.id < c.id)"
+    )
+
+    with op.batch_alter_table('rel_accounting_tax_rule_2_countries') as batch_op:
+        batch_op.alter_column('tax_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('b2c_rule', existing_type=sa.Boolean(), nullable=False)
+        batch_op.create_foreign_key('rel_accounting_tax_rule_2_countries_tax_id_fkey',
+                                    'accounting_taxes', ['tax_id'], ['id'])
+        batch_op.create_unique_constraint('uq_tax_rule_country_per_option', ['tax_id', 'b2c_rule', 'country_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('rel_accounting_tax_rule_2_countries') as batch_op:
+        batch_op.drop_constraint('uq_tax_rule_country_per_option', type_='unique')
+        batch_op.drop_constraint('rel_accounting_tax_rule_2_countries_tax_id_fkey', type_='foreignkey')
+        batch_op.drop_column('b2c_rule')
+        batch_op.drop_column('tax_id')
@@ -0,0 +1,34 @@
+"""add the write marks that keep the reads of recent writers on the primary
+
+Revision ID: b41f6e2c9d07
+Revises: 657b9d42d2f4
+Create Date: 2026-10-18 09:12:44.315208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41f6e2c9d07'
+down_revision = '657b9d42d2f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('replica_write_marks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mark_key', sa.String(length=40), nullable=False),
+    sa.Column('written_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_replica_write_marks_mark_key_written_at', 'replica_write_marks', ['mark_key', 'written_at'],
+                    unique=False)
+    op.create_index('ix_replica_write_marks_written_at', 'replica_write_marks', ['written_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_replica_write_marks_written_at', table_name='replica_write_marks')
+    op.drop_index('ix_replica_write_marks_mark_key_written_at', table_name='replica_write_marks')
+    op.drop_table('replica_write_marks')
@@ -0,0 +1,56 @@
+"""initial tax schema
+
+Revision ID: c021442e9d35
+Revises: 
+Create Date: 2026-10-18 09:12:41.318204
+
+Databases created before migrations were tracked already have these tables,
+stamp them with `flask db stamp c021442e9d35` before upgrading.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c021442e9d35'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('accounting_taxes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.String(length=250), nullable=False),
+    sa.Column('tax_uuid', sa.String(length=250), nullable=False),
+    sa.Column('name', sa.String(length=250), nullable=False),
+    sa.Column('default_tax', sa.Numeric(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('tax_uuid')
+    )
+    op.create_table('accounting_tax_rules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tax_rule_name', sa.String(length=250), nullable=False),
+    sa.Column('tax_rule_uuid', sa.String(length=250), nullable=False),
+    sa.Column('tax_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Numeric(), nullable=False),
+    sa.Column('b2c_rule', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['tax_id'], ['accounting_taxes.id'], name='accounting_tax_rules_tax_id_fkey'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('tax_rule_uuid')
+    )
+    op.create_table('rel_accounting_tax_rule_2_countries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tax_rule_id', sa.Integer(), nullable=False),
+    sa.Column('country_id', sa.String(length=3), nullable=False),
+    sa.ForeignKeyConstraint(['tax_rule_id'], ['accounting_tax_rules.id'],
+                            name='rel_accounting_tax_rule_2_countries_tax_rule_id_fkey'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('rel_accounting_tax_rule_2_countries')
+    op.drop_table('accounting_tax_rules')
+    op.drop_table('accounting_taxes')
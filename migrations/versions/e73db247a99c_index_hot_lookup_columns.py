@@ -0,0 +1,31 @@
+"""index hot lookup columns
+
+Revision ID: e73db247a99c
+Revises: 8cec12cece37
+Create Date: 2026-10-18 10:31:17.550291
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e73db247a99c'
+down_revision = '8cec12cece37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_accounting_taxes_company_id_tax_uuid', 'accounting_taxes',
+                    ['company_id', 'tax_uuid'], unique=False)
+    op.create_index('ix_accounting_tax_rules_tax_id_b2c_rule', 'accounting_tax_rules',
+                    ['tax_id', 'b2c_rule'], unique=False)
+    op.create_index('ix_rel_accounting_tax_rule_2_countries_tax_rule_id_country_id',
+                    'rel_accounting_tax_rule_2_countries', ['tax_rule_id', 'country_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_rel_accounting_tax_rule_2_countries_tax_rule_id_country_id',
+                  table_name='rel_accounting_tax_rule_2_countries')
+    op.drop_index('ix_accounting_tax_rules_tax_id_b2c_rule', table_name='accounting_tax_rules')
+    op.drop_index('ix_accounting_taxes_company_id_tax_uuid', table_name='accounting_taxes')
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+import asyncio
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from werkzeug.exceptions import HTTPException
+
+from pluto.geoClient import country_catalog
+from pluto.guardianClient import GuardianClient, read_permission
+from pluto.metrics import observe_upstream
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+
+# GET endpoints whose Guardian call is made on the event loop before the view runs
+READ_ENDPOINTS = frozenset([
+    "pluto.fetch_all_taxes",
+    "pluto.fetch_tax_by_id",
+    "pluto.fetch_tax_configuration",
+    "pluto.fetch_tax_rules",
+    "pluto.fetch_tax_rule_by_id",
+    "pluto.fetch_changes"
+])
+
+
+class AsyncGuardianClient:
+    """Non-blocking counterpart of GuardianClient with its own keep-alive pool."""
+
+    def __init__(self, config):
+        self.host = config.get("GUARDIAN_SERVICE")
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=config.get("ASGI_UPSTREAM_MAX_CONNECTIONS")),
+            timeout=httpx.Timeout(config.get("UPSTREAM_READ_TIMEOUT"), connect=config.get("UPSTREAM_CONNECT_TIMEOUT")),
+            transport=httpx.AsyncHTTPTransport(retries=config.get("UPSTREAM_RETRIES"))
+        )
+
+    async def get_user_permission(self, user_uuid: str, company_id: str):
+        start = time.perf_counter()
+        try:
+            response = await self._client.get(GuardianClient(self.host, user_uuid, company_id).guardian_service_url)
+        except httpx.TimeoutException:
+            observe_upstream("guardian", time.perf_counter() - start, reason="timeout")
+            raise
+        except httpx.RequestError:
+            observe_upstream("guardian", time.perf_counter() - start, reason="connection")
+            raise
+        observe_upstream("guardian", time.perf_counter() - start, response.status_code)
+        return response
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class AsgiApp:
+    """Serves the flask app under an ASGI server.
+
+    Requests to the read endpoints are authorized on the event loop, so a request waiting
+    for Guardian does not hold a thread; the result is handed to the view through the wsgi
+    environ. The views themselves, with their database work, run unchanged on a bounded
+    thread pool, which keeps routes and responses identical to the wsgi deployment.
+    """
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self._executor = ThreadPoolExecutor(max_workers=flask_app.config.get("ASGI_WSGI_WORKERS"),
+                                            thread_name_prefix="pluto-asgi")
+        self._guardian = None
+        self._pending = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"unsupported asgi scope {scope['type']}")
+
+        body = await self._read_body(receive)
+        try:
+            environ = self._environ(scope, body)
+            await self._authorize(environ)
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(self._executor, self._run_wsgi, environ, send, loop)
+        finally:
+            body.close()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await asyncio.get_event_loop().run_in_executor(self._executor, self._warm_up)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._guardian is not None:
+                    await self._guardian.close()
+                    self._guardian = None
+                self._executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _warm_up(self):
+        # rule writes validate their countries against the catalog, fetch it before the first request
+        with self.app.app_context():
+            try:
+                country_catalog.get(self.app.config.get("GEOSERVICE"), self.app.config)
+            except Exception as e:
+                self.app.logger.info(f"could not load country catalog on startup --> {e}")
+
+    async def _read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=self.app.config.get("IMPORT_SPOOL_MEMORY"))
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            body.write(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body.seek(0)
+        return body
+
+    async def _authorize(self, environ):
+        try:
+            endpoint, view_args = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return
+
+        # requests without user headers are answered by the view itself
+        if endpoint not in READ_ENDPOINTS or environ["REQUEST_METHOD"] != "GET" or \
+                "HTTP_X_USER_ID" not in environ or "HTTP_X_USER_UUID" not in environ:
+            return
+
+        user_uuid = environ["HTTP_X_USER_UUID"]
+        company_id = view_args["company_id"]
+        transaction_id = environ.get("HTTP_X_TRANSACTIONID", "")
+
+        hit, denial = self.app.extensions["permission_cache"].get(user_uuid, company_id)
+        if not hit:
+            # concurrent requests of the same user share one guardian call
+            key = (user_uuid, company_id)
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._fetch_permission(user_uuid, company_id, transaction_id))
+                self._pending[key] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            denial = await asyncio.shield(pending)
+
+        environ[PERMISSION_ENVIRON_KEY] = denial
+
+    async def _fetch_permission(self, user_uuid, company_id, transaction_id):
+        if self._guardian is None:
+            self._guardian = AsyncGuardianClient(self.app.config)
+        try:
+            response = await self._guardian.get_user_permission(user_uuid, company_id)
+            denial = read_permission(response, self.app.logger, transaction_id)
+        except httpx.RequestError as e:
+            self.app.logger.info(f"{transaction_id}: guardian is not reachable --> {e}")
+            denial = 503, "guardian service unavailable", "request_id"
+
+        self.app.extensions["permission_cache"].store(user_uuid, company_id, denial, self.app.config)
+        return denial
+
+    @staticmethod
+    def _environ(scope, body):
+        server = scope.get("server") or ("localhost", 80)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1] or 80),
+            "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False
+        }
+        if scope.get("client"):
+            environ["REMOTE_ADDR"] = scope["client"][0]
+
+        for name, value in scope["headers"]:
+            name = name.decode("latin-1")
+            if name == "content-length":
+                key = "CONTENT_LENGTH"
+            elif name == "content-type":
+                key = "CONTENT_TYPE"
+            else:
+                key = "HTTP_" + name.upper().replace("-", "_")
+            value = value.decode("latin-1")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _run_wsgi(self, environ, send, loop):
+        """Runs the view and its whole response iterator on one pool thread, streamed responses
+        need the request context that stream_with_context pushed on that thread."""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                   for name, value in headers]
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        iterable = self.app(environ, start_response)
+        try:
+            started = False
+            for chunk in iterable:
+                if not started:
+                    emit({"type": "http.response.start", "status": response["status"],
+                          "headers": response["headers"]})
+                    started = True
+                if chunk:
+                    emit({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not started:
+                emit({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+            emit({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+
+class AuthPool:
+    """The thread pool that runs guardian calls next to the database reads of one app.
+
+    The pool is bounded by CONCURRENT_AUTH_WORKERS and rebuilt after a fork, the threads of
+    the parent do not exist in the worker.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ThreadPoolExecutor:
+        if self.executor is not None and self._pid == os.getpid():
+            return self.executor
+
+        with self._lock:
+            if self.executor is None or self._pid != os.getpid():
+                self.executor = ThreadPoolExecutor(max_workers=self.config.get("CONCURRENT_AUTH_WORKERS"),
+                                                   thread_name_prefix="pluto-auth")
+                self._pid = os.getpid()
+            return self.executor
+
+
+def get_executor() -> ThreadPoolExecutor:
+    return current_app.extensions["auth_pool"].get()
+
+
+def init_app(app):
+    app.extensions["auth_pool"] = AuthPool(app.config)
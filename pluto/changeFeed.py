@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import text
+from werkzeug.local import LocalProxy
+
+from pluto.exceptions.change_feed_exceptions import TooManyWaiters
+from pluto.models import TaxChange, db
+
+TAX_CREATED = "tax_created"
+TAX_UPDATED = "tax_updated"
+TAX_DELETED = "tax_deleted"
+RULE_CREATED = "rule_created"
+RULE_UPDATED = "rule_updated"
+RULE_DELETED = "rule_deleted"
+
+# advisory lock every transaction that numbers changes holds until it commits
+SEQUENCE_LOCK_KEY = 0x706c7574
+
+
+class ChangeNotifier:
+    """Wakes the long-polls of an app after a change was committed.
+
+    Changes committed by other workers are picked up by the periodic re-read of the waiting requests.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._waiters = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def notify(self):
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait(self, generation, timeout):
+        """Blocks until a change newer than generation was committed or the timeout passed."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._generation != generation, timeout)
+
+    def enter(self, max_waiters):
+        """Takes one of max_waiters slots for a waiting request, False if all are taken."""
+        with self._condition:
+            if self._waiters >= max_waiters:
+                return False
+            self._waiters += 1
+            return True
+
+    def leave(self):
+        with self._condition:
+            self._waiters -= 1
+
+
+# the notifier of the current app, each app built by create_app has its own
+change_notifier = LocalProxy(lambda: current_app.extensions["change_notifier"])
+
+
+def lock_sequence():
+    """Makes the changes of the current transaction visible in the order of their sequence numbers.
+
+    Pending writes are flushed first, so the lock is never held while waiting for row locks.
+    On PostgreSQL a transaction-level advisory lock is taken, which the commit or rollback
+    releases: a transaction numbers its changes only after the previous one committed.
+    sqlite serializes writing transactions on its own.
+    """
+    db.session.flush()
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEQUENCE_LOCK_KEY})
+
+
+def record_change(company_id, tax_uuid, action, tax_rule_uuid=None):
+    """Adds a change to the current transaction, it becomes visible with the commit of the change itself.
+
+    Call it right before the commit, the sequence stays locked until then.
+    """
+    lock_sequence()
+    db.session.add(TaxChange(company_id, tax_uuid, action, tax_rule_uuid))
+
+
+def read_changes(company_id, since, limit):
+    """Changes after the sequence number since, oldest first.
+
+    Sequence numbers become visible in commit order, a consumer never moves past a change
+    that is still to be committed.
+    """
+    return TaxChange.query.filter(TaxChange.company_id == company_id).filter(TaxChange.id > since)\
+        .order_by(TaxChange.id).limit(limit).all()
+
+
+def wait_for_changes(company_id, since, limit, wait, config):
+    """Long-poll of read_changes: returns as soon as there are changes or after wait seconds.
+
+    A waiting request holds its worker thread, at most CHANGE_FEED_MAX_WAITERS of them wait
+    per app; beyond that TooManyWaiters is raised instead of waiting.
+    """
+    generation = change_notifier.generation
+    changes = read_changes(company_id, since, limit)
+    if changes or wait <= 0:
+        return changes
+
+    if not change_notifier.enter(config.get("CHANGE_FEED_MAX_WAITERS")):
+        raise TooManyWaiters("too many requests are waiting for changes")
+
+    poll_interval = config.get("CHANGE_FEED_POLL_INTERVAL_MS") / 1000
+    deadline = time.monotonic() + wait
+    try:
+        while True:
+            # the connection goes back to the pool while the request waits
+            db.session.close()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return changes
+            change_notifier.wait(generation, min(remaining, poll_interval))
+
+            generation = change_notifier.generation
+            changes = read_changes(company_id, since, limit)
+            if changes:
+                return changes
+    finally:
+        change_notifier.leave()
+
+
+def init_app(app):
+    app.extensions["change_notifier"] = ChangeNotifier()
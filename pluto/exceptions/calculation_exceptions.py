@@ -0,0 +1,14 @@
+from pluto.exceptions.base_exceptions import Error
+
+
+class InvalidCalculation(Error):
+    """
+    Exception raised when the line items of a tax calculation are not valid.
+
+    Attributes:
+        message -- explanation of the error
+        errors -- the problems found, each with the index of its line item
+    """
+    def __init__(self, message, errors):
+        super().__init__(message)
+        self.errors = errors
@@ -0,0 +1,10 @@
+from pluto.exceptions.base_exceptions import Error
+
+
+class TooManyWaiters(Error):
+    """
+    Exception raised when a long-poll of the change feed would exceed the waiters of the process.
+
+    Attributes:
+        message -- explanation of the error
+    """
@@ -0,0 +1,14 @@
+from pluto.exceptions.base_exceptions import Error
+
+
+class InvalidImportDocument(Error):
+    """
+    Exception raised when a tax configuration import document is not valid.
+
+    Attributes:
+        message -- explanation of the error
+        errors -- the problems found, each with its line number
+    """
+    def __init__(self, message, errors):
+        super().__init__(message)
+        self.errors = errors
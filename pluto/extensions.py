@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""Extensions shared by every app created with `create_app`, bound to it there."""
+import sqlite3
+
+from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from pluto.readReplicas import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+migrate = Migrate()
+
+
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # sqlite ignores foreign keys, and with them the ON DELETE CASCADE the deletes rely on, unless asked per connection
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
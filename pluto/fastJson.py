@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import json as stdlib_json
+from decimal import Decimal
+
+from flask import current_app, has_app_context, request
+from flask.json import JSONEncoder as FlaskJSONEncoder
+
+from pluto.exceptions.configurations_exceptions import ImproperlyConfigured
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# used outside of an app context and by apps that did not call init_app
+_DEFAULT_SETTINGS = {"backend": "orjson" if orjson is not None else "stdlib", "decimal_mode": "float"}
+
+
+def _settings():
+    if has_app_context():
+        return current_app.extensions.get("fast_json", _DEFAULT_SETTINGS)
+    return _DEFAULT_SETTINGS
+
+
+def _encode_decimal(value: Decimal, decimal_mode):
+    """Numeric columns are written as json numbers, or as exact strings with JSON_DECIMAL_MODE=string."""
+    if decimal_mode == "string":
+        return format(value.normalize(), "f")
+    return float(value)
+
+
+def _default(decimal_mode):
+    def default(value):
+        if isinstance(value, Decimal):
+            return _encode_decimal(value, decimal_mode)
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return default
+
+
+_DECIMAL_DEFAULTS = {mode: _default(mode) for mode in ("float", "string")}
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    """Encoder for flask.json, so code that still goes through it handles Decimal the same way."""
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return _encode_decimal(o, _settings()["decimal_mode"])
+        return super().default(o)
+
+
+def dumps(data, sort_keys=False, indent=False) -> str:
+    settings = _settings()
+    default = _DECIMAL_DEFAULTS[settings["decimal_mode"]]
+    if settings["backend"] == "orjson":
+        option = (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, default=default, option=option).decode("utf-8")
+
+    if indent:
+        return stdlib_json.dumps(data, default=default, sort_keys=sort_keys, indent=2, separators=(",", ": "))
+    return stdlib_json.dumps(data, default=default, sort_keys=sort_keys, separators=(",", ":"))
+
+
+def jsonify(*args, **kwargs):
+    """Drop-in for flask.jsonify on top of dumps, honouring JSON_SORT_KEYS and JSONIFY_PRETTYPRINT_REGULAR."""
+    if args and kwargs:
+        raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+    elif len(args) == 1:
+        data = args[0]
+    else:
+        data = args or kwargs
+
+    config = current_app.config
+    indent = config.get("JSONIFY_PRETTYPRINT_REGULAR") and not getattr(request, "is_xhr", False)
+    return current_app.response_class(
+        (dumps(data, sort_keys=config.get("JSON_SORT_KEYS"), indent=indent), "\n"),
+        mimetype=config.get("JSONIFY_MIMETYPE")
+    )
+
+
+def init_app(app):
+    """Selects the backend (JSON_BACKEND auto, orjson or stdlib) and the Decimal policy for the whole app."""
+    backend = app.config.get("JSON_BACKEND")
+    if backend == "orjson" and orjson is None:
+        raise ImproperlyConfigured("JSON_BACKEND is orjson but orjson is not installed")
+    if backend == "auto":
+        backend = "orjson" if orjson is not None else "stdlib"
+
+    decimal_mode = app.config.get("JSON_DECIMAL_MODE")
+    if decimal_mode not in _DECIMAL_DEFAULTS:
+        raise ImproperlyConfigured(f"JSON_DECIMAL_MODE has to be float or string, not {decimal_mode}")
+
+    app.extensions["fast_json"] = {"backend": backend, "decimal_mode": decimal_mode}
+    app.json_encoder = JSONEncoder
@@ -1,9 +1,131 @@
 #!/usr/bin/env python3
 
 from flask import json, current_app as app
+from werkzeug.local import LocalProxy
+from pluto.httpSession import get_session, get_timeout
+from pluto.metrics import timed_upstream
+import os
+import tempfile
+import threading
+import time
 import requests
 
 
+class CountryCatalog:
+    """Per-app cache of the country ids known to the geo service.
+
+    Entries older than the ttl are revalidated with If-None-Match / If-Modified-Since.
+    If the geo service cannot be reached a stale catalog keeps being served. With a
+    snapshot path configured the catalog is seeded from and written back to disk, so a
+    freshly started worker does not need the network to validate countries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, url):
+        self.url = url
+        self.country_ids = frozenset()
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = None
+
+    def get(self, url: str, config) -> frozenset:
+        ttl = config.get("GEO_CATALOG_TTL")
+        if self.url == url and self.fetched_at is not None and time.time() - self.fetched_at < ttl:
+            return self.country_ids
+
+        if not self._lock.acquire(blocking=self.url != url or not self.country_ids):
+            # another thread is revalidating, the stale catalog is good enough meanwhile
+            return self.country_ids
+
+        try:
+            if self.url != url:
+                self._reset(url)
+                self._load_snapshot(config.get("GEO_CATALOG_SNAPSHOT"))
+
+            if self.fetched_at is None or time.time() - self.fetched_at >= ttl:
+                self._refresh(config)
+            return self.country_ids
+        finally:
+            self._lock.release()
+
+    def _refresh(self, config):
+        headers = {}
+        if self.country_ids and self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.country_ids and self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        try:
+            r = timed_upstream("geo", lambda: get_session().get(
+                self.url, headers=headers, timeout=get_timeout(config)))
+        except requests.RequestException as e:
+            if not self.country_ids:
+                raise
+            app.logger.info(f"geo service not reachable, serving stale country catalog --> {e}")
+            return
+
+        try:
+            if r.status_code == 304:
+                self.fetched_at = time.time()
+            elif r.status_code == 200:
+                self.country_ids = frozenset(country["id"] for country in (r.json() or []))
+                self.etag = r.headers.get("ETag")
+                self.last_modified = r.headers.get("Last-Modified")
+                self.fetched_at = time.time()
+            else:
+                app.logger.info(f"geo service answered with status {r.status_code}, keeping country catalog")
+                return
+        finally:
+            r.close()
+
+        self._write_snapshot(config.get("GEO_CATALOG_SNAPSHOT"))
+
+    def _load_snapshot(self, path):
+        if not path or not os.path.exists(path):
+            return
+
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            app.logger.info(f"could not read country catalog snapshot {path} --> {e}")
+            return
+
+        if snapshot.get("url") != self.url:
+            return
+
+        self.country_ids = frozenset(snapshot.get("countries", []))
+        self.etag = snapshot.get("etag")
+        self.last_modified = snapshot.get("last_modified")
+        self.fetched_at = snapshot.get("fetched_at")
+
+    def _write_snapshot(self, path):
+        if not path:
+            return
+
+        snapshot = {
+            "url": self.url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": self.fetched_at,
+            "countries": sorted(self.country_ids)
+        }
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+            with os.fdopen(fd, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            app.logger.info(f"could not write country catalog snapshot {path} --> {e}")
+
+
+# the catalog of the current app, each app built by create_app has its own
+country_catalog = LocalProxy(lambda: app.extensions["country_catalog"])
+
+
 class GeoServiceClient:
     geo_service_url = ""
 
@@ -11,18 +133,20 @@ class GeoServiceClient:
         self.geo_service_url = "{}".format(host)
 
     def validate_countries(self, country_list):
-        countries = []
-        r = requests.get(self.geo_service_url)
+        geo_countries = country_catalog.get(self.geo_service_url, app.config)
 
-        if not r.json():
+        if not geo_countries:
             return False
 
-        geo_countries = r.json()
-
-        for country in geo_countries:
-            if country["id"] in country_list:
-                countries.append(country["id"])
+        countries = []
+        seen = set()
+        for country in country_list:
+            if isinstance(country, str) and country in geo_countries and country not in seen:
+                seen.add(country)
+                countries.append(country)
 
-        r.close()
         return countries
 
+
+def init_app(flask_app):
+    flask_app.extensions["country_catalog"] = CountryCatalog()
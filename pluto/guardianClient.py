@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from flask import current_app as app
-import requests
+from pluto.httpSession import get_session, get_timeout
+from pluto.metrics import timed_upstream
 
 
 class GuardianClient:
@@ -10,12 +11,44 @@ class GuardianClient:
         self.guardian_service_url = "{}/{}/{}".format(host, user_uuid, company_id)
 
     def get_user_permission(self):
-        r = requests.get(self.guardian_service_url)
+        r = timed_upstream("guardian", lambda: get_session().get(
+            self.guardian_service_url, timeout=get_timeout(app.config)))
         app.logger.debug(r.text)
         return r
 
-    def validate_permission(self, permission: int) -> bool:
+    @staticmethod
+    def validate_permission(permission: int) -> bool:
         if permission >= 0 and permission <= 2:
             return True
         else:
             return False
+
+
+def read_permission(response, logger, transaction_id):
+    """Turns a Guardian answer into None if the user may access the company, otherwise
+    into the denial as a (status_code, message, request id field) tuple.
+
+    Works on responses of requests as well as of the async client of pluto/asgi.py.
+    """
+    if response.status_code >= 400:
+        logger.info(
+            f"{transaction_id}: got aborted transaction as answer from Guardian with status {response.status_code}")
+
+        if response.status_code == 401:
+            return 401, "user has no permission", "reques_id"
+        elif response.status_code == 404:
+            return 404, "resource does not exist", "reques_id"
+        else:
+            return 500, "unkown error", "reques_id"
+
+    data = response.json()
+    if "status" in data and data["status"] == "OK":
+        permission = data["data"]["user_permission"]
+        logger.info(f"{transaction_id}: successfully got user permission from guardian --> {permission}")
+
+        if not GuardianClient.validate_permission(permission):
+            return 401, "user has not the permission to create taxes", "request_id"
+
+    else:
+        logger.info(f"{transaction_id}: error during communication with guardian --> {data}")
+        return 500, "unkown response from guardian", "request_id"
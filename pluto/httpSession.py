@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import os
+import threading
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def _build_session(config) -> requests.Session:
+    retries = Retry(
+        total=config.get("UPSTREAM_RETRIES"),
+        backoff_factor=config.get("UPSTREAM_RETRY_BACKOFF"),
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.get("UPSTREAM_POOL_CONNECTIONS"),
+        pool_maxsize=config.get("UPSTREAM_POOL_MAXSIZE"),
+        max_retries=retries
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class UpstreamSession:
+    """The keep-alive session shared by all upstream clients of one app.
+
+    The session is rebuilt after a fork so workers never share sockets with their parent.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self) -> requests.Session:
+        if self.session is not None and self._pid == os.getpid():
+            return self.session
+
+        with self._lock:
+            if self.session is None or self._pid != os.getpid():
+                self.session = _build_session(self.config)
+                self._pid = os.getpid()
+            return self.session
+
+    def current(self):
+        """The session of this process, None before the first upstream call."""
+        return self.session if self._pid == os.getpid() else None
+
+
+def get_session() -> requests.Session:
+    return current_app.extensions["upstream_session"].get()
+
+
+def get_timeout(config):
+    return config.get("UPSTREAM_CONNECT_TIMEOUT"), config.get("UPSTREAM_READ_TIMEOUT")
+
+
+def pool_stats():
+    """Connection pool utilisation per upstream host of the session of the current app."""
+    session = current_app.extensions["upstream_session"].current()
+    if session is None:
+        return []
+
+    stats = []
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            # the pool queue holds idle connections and free slots, everything else is checked out
+            available = pool.pool.qsize() if pool.pool is not None else 0
+            stats.append({
+                'scheme': pool.scheme,
+                'host': pool.host,
+                'port': pool.port,
+                'maxsize': pool.pool.maxsize if pool.pool is not None else 0,
+                'in_use': (pool.pool.maxsize - available) if pool.pool is not None else 0,
+                'connections_created': pool.num_connections,
+                'requests': pool.num_requests
+            })
+    return stats
+
+
+def init_app(app):
+    app.extensions["upstream_session"] = UpstreamSession(app.config)
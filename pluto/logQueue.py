@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+
+class JsonFormatter(logging.Formatter):
+    """One json object per line, with the transaction id of the request that logged it."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "transaction_id": getattr(record, "transaction_id", None),
+            "location": f"{record.pathname}:{record.lineno}"
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry)
+
+
+def _transaction_id():
+    if not has_request_context():
+        return None
+    return g.get("transaction_id") or request.headers.get("x-transactionid")
+
+
+class InfoSampler(logging.Filter):
+    """Keeps the info and debug lines of a fixed share of the requests, warnings always pass.
+
+    The decision is taken from the transaction id, so a request is logged completely or not
+    at all, and the same in every service that samples on it.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.threshold = int(rate * 10000)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.threshold >= 10000:
+            return True
+        transaction_id = _transaction_id()
+        if transaction_id is None:
+            return True
+        return zlib.crc32(transaction_id.encode("utf-8")) % 10000 < self.threshold
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to a background writer through a bounded queue.
+
+    A full queue drops the record instead of blocking the request; the number of dropped
+    records is written as a warning once there is room again. The writer thread is started
+    lazily per process, a forked worker does not inherit the one of its parent.
+    """
+
+    def __init__(self, handlers, maxsize):
+        super().__init__(None)
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(self.maxsize)
+                self._listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record):
+        # the message is merged and a traceback rendered here, the record must not keep
+        # request objects or frames alive while it waits in the queue
+        record = copy.copy(record)
+        record.transaction_id = _transaction_id()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        with self._lock:
+            try:
+                if self.dropped:
+                    self.queue.put_nowait(logging.LogRecord(
+                        record.name, logging.WARNING, __file__, 0,
+                        f"dropped {self.dropped} log records, the log output is too slow", None, None))
+                    self.dropped = 0
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+    def stop(self):
+        """Writes what is still queued, called on exit."""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+
+def init_app(app, log_level):
+    """Replaces the handlers of the app logger with a stdout writer behind a bounded queue.
+
+    LOG_FORMAT selects the text or json format, LOG_INFO_SAMPLE_RATE the share of requests
+    whose info lines are written.
+    """
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setLevel(log_level)
+    if app.config.get("LOG_FORMAT") == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    handler = stream
+    if app.config.get("LOG_QUEUE_ENABLED"):
+        handler = BoundedQueueHandler([stream], app.config.get("LOG_QUEUE_SIZE"))
+        handler.setLevel(log_level)
+        atexit.register(handler.stop)
+    if app.config.get("LOG_INFO_SAMPLE_RATE") < 1:
+        handler.addFilter(InfoSampler(app.config.get("LOG_INFO_SAMPLE_RATE")))
+
+    for h in list(app.logger.handlers):
+        app.logger.removeHandler(h)
+    app.logger.addHandler(handler)
+    app.logger.setLevel(log_level)
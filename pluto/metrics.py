@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+import threading
+import time
+from bisect import bisect_left
+
+import requests
+from flask import Response, g, has_app_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from pluto.httpSession import pool_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = 'le="{}"'.format(_number(bound))
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {count}")
+        return lines
+
+
+http_requests = Counter(
+    "pluto_http_requests_total", "Requests by route and status code.", ("method", "route", "status"))
+http_duration = Histogram(
+    "pluto_http_request_duration_seconds", "Time until the response was returned by the view.",
+    ("method", "route", "status"))
+upstream_duration = Histogram(
+    "pluto_upstream_request_duration_seconds", "Duration of Guardian and geo service calls.", ("service",))
+upstream_failures = Counter(
+    "pluto_upstream_failures_total", "Failed upstream calls by reason (timeout, connection, status).",
+    ("service", "reason"))
+db_queries = Counter("pluto_db_queries_total", "Statements sent to the database.")
+db_query_duration = Counter("pluto_db_query_seconds_total", "Time spent in database statements.")
+db_queries_per_request = Histogram(
+    "pluto_db_queries_per_request", "Statements per request.", ("route",), QUERY_COUNT_BUCKETS)
+db_time_per_request = Histogram(
+    "pluto_db_time_per_request_seconds", "Time spent in database statements per request.", ("route",))
+
+METRICS = [http_requests, http_duration, upstream_duration, upstream_failures, db_queries, db_query_duration,
+           db_queries_per_request, db_time_per_request]
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def observe_upstream(service, seconds, status_code=None, reason=None):
+    """Records one upstream call; answers with a 5xx status count as failures."""
+    upstream_duration.observe(seconds, service)
+    if reason is None and status_code is not None and status_code >= 500:
+        reason = "status"
+    if reason is not None:
+        upstream_failures.inc(service, reason)
+
+
+def timed_upstream(service, send):
+    """Runs send(), a call of the shared requests session, and records it."""
+    start = time.perf_counter()
+    try:
+        response = send()
+    except requests.Timeout:
+        observe_upstream(service, time.perf_counter() - start, reason="timeout")
+        raise
+    except requests.RequestException:
+        observe_upstream(service, time.perf_counter() - start, reason="connection")
+        raise
+    observe_upstream(service, time.perf_counter() - start, response.status_code)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("pluto_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("pluto_query_start")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    db_queries.inc()
+    db_query_duration.inc(amount=elapsed)
+    if has_app_context() and "pluto_request_start" in g:
+        g.pluto_db_queries += 1
+        g.pluto_db_time += elapsed
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("pluto_query_start"):
+        connection.info["pluto_query_start"].pop()
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _start_request():
+    g.pluto_request_start = time.perf_counter()
+    g.pluto_db_queries = 0
+    g.pluto_db_time = 0.0
+
+
+def _finish_request(status_code):
+    start = g.pop("pluto_request_start", None)
+    if start is None:
+        return
+
+    route = _route()
+    status = str(status_code)
+    http_requests.inc(request.method, route, status)
+    http_duration.observe(time.perf_counter() - start, request.method, route, status)
+    db_queries_per_request.observe(g.pluto_db_queries, route)
+    db_time_per_request.observe(g.pluto_db_time, route)
+
+
+def _after_request(response):
+    _finish_request(response.status_code)
+    return response
+
+
+def _teardown_request(exc):
+    # unhandled errors skip after_request, flask answers them with a 500
+    if exc is not None:
+        _finish_request(500)
+
+
+def init_app(app):
+    """Instruments the requests and database statements of the app and serves them at /metrics,
+    the connection pools of the upstream session at /metrics/upstream."""
+    if not app.config.get("METRICS_ENABLED"):
+        return
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", lambda: Response(render(), mimetype="text/plain; version=0.0.4"))
+    app.add_url_rule("/metrics/upstream", "upstream_stats", lambda: jsonify(status="OK", status_code=200, pools=pool_stats()))
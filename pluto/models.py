@@ -1,9 +1,14 @@
-from app import db
+from pluto.extensions import db
+import datetime
 import uuid
 
 
 class Tax(db.Model):
     __tablename__ = "accounting_taxes"
+    __table_args__ = (
+        db.Index("ix_accounting_taxes_company_id_tax_uuid", "company_id", "tax_uuid"),
+        db.Index("ix_accounting_taxes_company_id_id", "company_id", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -11,8 +16,11 @@ class Tax(db.Model):
     tax_uuid = db.Column(db.String(250), unique=True, nullable=False)
     name = db.Column(db.String(250), nullable=False)
     default_tax = db.Column(db.Numeric, nullable=False, default=0.00)
+    # raised on every change to the tax, its rules or their countries, the read endpoints derive their ETags from it
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
 
-    tax_rules = db.relationship("TaxRule", backref="accounting_taxes", lazy=True, cascade='delete,all')
+    tax_rules = db.relationship("TaxRule", backref="accounting_taxes", lazy=True, cascade='delete,all',
+                                passive_deletes=True, order_by="TaxRule.id")
 
     def __init__(self, company_id, name, default_tax):
         self.company_id = company_id
@@ -23,19 +31,23 @@ class Tax(db.Model):
 
 class TaxRule(db.Model):
     __tablename__ = "accounting_tax_rules"
+    __table_args__ = (
+        db.Index("ix_accounting_tax_rules_tax_id_b2c_rule", "tax_id", "b2c_rule"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
     tax_rule_name = db.Column(db.String(250), nullable=False)
     tax_rule_uuid = db.Column(db.String(250), unique=True, nullable=False)
 
-    tax_id = db.Column(db.Integer, db.ForeignKey("accounting_taxes.id"), nullable=False)
+    tax_id = db.Column(db.Integer, db.ForeignKey("accounting_taxes.id", ondelete="CASCADE"), nullable=False)
 
     value = db.Column(db.Numeric, nullable=False, default=0.00)
 
     b2c_rule = db.Column(db.Boolean, default=False, nullable=False)
 
-    countries = db.relationship("TaxRuleCountry", backref="accounting_tax_rules", cascade='delete,all', lazy=True)
+    countries = db.relationship("TaxRuleCountry", backref="accounting_tax_rules", cascade='delete,all', lazy=True,
+                                passive_deletes=True, order_by="TaxRuleCountry.id")
 
     def __init__(self, tax_id, value, tax_rule_name, b2c_rule=False):
         self.value = value
@@ -47,11 +59,67 @@ class TaxRule(db.Model):
 
 class TaxRuleCountry(db.Model):
     __tablename__ = "rel_accounting_tax_rule_2_countries"
+    __table_args__ = (
+        # tax_id and b2c_rule are copied from the rule, so a country can only be used once per tax and option
+        db.UniqueConstraint("tax_id", "b2c_rule", "country_id", name="uq_tax_rule_country_per_option"),
+        db.Index("ix_rel_accounting_tax_rule_2_countries_tax_rule_id_country_id", "tax_rule_id", "country_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
-    tax_rule_id = db.Column(db.Integer, db.ForeignKey("accounting_tax_rules.id"), nullable=False)
+    tax_rule_id = db.Column(db.Integer, db.ForeignKey("accounting_tax_rules.id", ondelete="CASCADE"), nullable=False)
     country_id = db.Column(db.String(3), nullable=False)
 
-    def __init__(self, country_id):
+    tax_id = db.Column(db.Integer, db.ForeignKey("accounting_taxes.id", ondelete="CASCADE"), nullable=False)
+    b2c_rule = db.Column(db.Boolean, nullable=False)
+
+    def __init__(self, country_id, tax_id, b2c_rule):
         self.country_id = country_id
+        self.tax_id = tax_id
+        self.b2c_rule = b2c_rule
+
+
+class TaxChange(db.Model):
+    """Append-only log of committed changes to the taxes of a company, served by GET /tax/changes."""
+    __tablename__ = "accounting_tax_changes"
+    __table_args__ = (
+        db.Index("ix_accounting_tax_changes_company_id_id", "company_id", "id"),
+    )
+
+    # the sequence number consumers resume from
+    id = db.Column(db.Integer, primary_key=True)
+
+    company_id = db.Column(db.String(250), nullable=False)
+    tax_uuid = db.Column(db.String(250), nullable=False)
+    tax_rule_uuid = db.Column(db.String(250), nullable=True)
+    action = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def __init__(self, company_id, tax_uuid, action, tax_rule_uuid=None):
+        self.company_id = company_id
+        self.tax_uuid = tax_uuid
+        self.action = action
+        self.tax_rule_uuid = tax_rule_uuid
+
+
+class ReplicaWriteMark(db.Model):
+    """Recent writes of a transaction id or of a user in a company, their reads stay on the primary.
+
+    Kept in the primary database so every worker and host sees them, rows older than
+    REPLICA_STICKY_SECONDS are removed by the following writes.
+    """
+    __tablename__ = "replica_write_marks"
+    __table_args__ = (
+        db.Index("ix_replica_write_marks_mark_key_written_at", "mark_key", "written_at"),
+        db.Index("ix_replica_write_marks_written_at", "written_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # sha1 of the transaction id or of the user and company, see readReplicas.mark_keys
+    mark_key = db.Column(db.String(40), nullable=False)
+    written_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def __init__(self, mark_key, written_at):
+        self.mark_key = mark_key
+        self.written_at = written_at
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+# wsgi environ key under which a frontend hands an already fetched permission result to the views
+PERMISSION_ENVIRON_KEY = "pluto.permission"
+
+
+class PermissionCache:
+    """Bounded LRU of Guardian permission results keyed by (user_uuid, company_id).
+
+    A stored result is None for a granted permission or the denial that was returned to
+    the client. Each entry carries its own expiry, so denials can be kept shorter than grants.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_uuid: str, company_id: str):
+        """Returns (True, result) on a hit and (False, None) on a miss."""
+        key = (user_uuid, company_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, user_uuid: str, company_id: str, result, ttl: float, max_size: int):
+        if ttl <= 0 or max_size <= 0:
+            return
+        key = (user_uuid, company_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def store(self, user_uuid: str, company_id: str, denial, config):
+        """Keeps a Guardian result for the ttl configured for grants or denials."""
+        cache_size = config.get("PERMISSION_CACHE_SIZE")
+        if denial is None:
+            self.put(user_uuid, company_id, None, config.get("PERMISSION_CACHE_TTL"), cache_size)
+        elif denial[0] in (401, 404):
+            self.put(user_uuid, company_id, denial, config.get("PERMISSION_CACHE_NEGATIVE_TTL"), cache_size)
+        else:
+            # errors of guardian itself are never cached
+            self.invalidate(user_uuid, company_id)
+
+    def invalidate(self, user_uuid: str, company_id: str):
+        with self._lock:
+            self._entries.pop((user_uuid, company_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# the cache of the current app, each app built by create_app has its own
+permission_cache = LocalProxy(lambda: current_app.extensions["permission_cache"])
+
+
+def init_app(app):
+    app.extensions["permission_cache"] = PermissionCache()
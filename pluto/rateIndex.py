@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+from pluto.models import Tax, TaxRule, TaxRuleCountry, db
+from pluto.readReplicas import on_primary
+
+
+class CompiledTax:
+    """Resolved rate table of a single tax.
+
+    `rates` maps (b2c, country_id) to (value, tax_rule_name). Rules without countries are
+    stored under (b2c, None) and act as the fallback of their b2c option.
+    """
+    __slots__ = ("tax_id", "company_id", "default_tax", "rates")
+
+    def __init__(self, tax_id, company_id, default_tax, rates):
+        self.tax_id = tax_id
+        self.company_id = company_id
+        self.default_tax = default_tax
+        self.rates = rates
+
+    def resolve(self, b2c: bool, country_id):
+        rate = self.rates.get((b2c, country_id)) or self.rates.get((b2c, None))
+        if rate is None:
+            return self.default_tax, ""
+        return rate
+
+
+def compile_tax(tax_id, company_id, default_tax, rows):
+    """Compiles the (b2c_rule, country_id, value, tax_rule_name) rows of one tax.
+
+    country_id is None for rules without any country. Keys matched by more than one row
+    are dropped, which mirrors the `count() == 1` checks of the rate lookup.
+    """
+    rates = {}
+    ambiguous = set()
+    for b2c, country_id, value, tax_rule_name in rows:
+        key = (b2c, country_id)
+        if key in rates:
+            ambiguous.add(key)
+        rates[key] = (value, tax_rule_name)
+
+    for key in ambiguous:
+        del rates[key]
+
+    return CompiledTax(tax_id, company_id, default_tax, rates)
+
+
+def rule_rows_query(tax_ids):
+    """One query returning (tax_id, b2c_rule, country_id, value, tax_rule_name) for all rules of the given taxes."""
+    return db.session.query(
+        TaxRule.tax_id, TaxRule.b2c_rule, TaxRuleCountry.country_id, TaxRule.value, TaxRule.tax_rule_name
+    ).outerjoin(TaxRuleCountry, TaxRuleCountry.tax_rule_id == TaxRule.id).filter(TaxRule.tax_id.in_(tax_ids))
+
+
+def load_compiled_taxes(tax_uuids):
+    """Compiles the given taxes with two queries, unknown uuids are left out of the result."""
+    taxes = db.session.query(Tax.id, Tax.tax_uuid, Tax.company_id, Tax.default_tax)\
+        .filter(Tax.tax_uuid.in_(tax_uuids)).all()
+    if not taxes:
+        return {}
+
+    rows = {tax.id: [] for tax in taxes}
+    for tax_id, *row in rule_rows_query(list(rows)):
+        rows[tax_id].append(row)
+
+    return {
+        tax.tax_uuid: compile_tax(tax.id, tax.company_id, tax.default_tax, rows[tax.id])
+        for tax in taxes
+    }
+
+
+class RateIndex:
+    """Per-process index of compiled taxes keyed by tax_uuid.
+
+    Writers call `invalidate` after committing a change to a tax. The ttl bounds how long
+    other worker processes, which never see that call, may serve a stale entry. Taxes the
+    optional rate snapshot can serve are taken from it and not held in the index. Misses are
+    always loaded from the primary.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, tax_uuid: str, ttl: float, max_size: int):
+        return self.get_many([tax_uuid], ttl, max_size).get(tax_uuid)
+
+    def get_many(self, tax_uuids, ttl: float, max_size: int):
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for tax_uuid in tax_uuids:
+                entry = self._entries.get(tax_uuid)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(tax_uuid)
+                    found[tax_uuid] = entry[1]
+                else:
+                    missing.append(tax_uuid)
+            generation = self._generation
+
+        if missing and self.snapshot is not None:
+            found.update(self.snapshot.get_many(missing))
+            missing = [tax_uuid for tax_uuid in missing if tax_uuid not in found]
+
+        if missing:
+            # cached entries must not come from a lagging replica, a read-only view would keep serving them
+            # after the write was invalidated
+            with on_primary():
+                loaded = load_compiled_taxes(missing)
+            for tax_uuid, compiled in loaded.items():
+                self.put(tax_uuid, compiled, ttl, max_size, generation)
+            found.update(loaded)
+
+        return found
+
+    def put(self, tax_uuid: str, compiled: CompiledTax, ttl: float, max_size: int, generation=None):
+        with self._lock:
+            # an invalidation that raced with the load wins, the entry is rebuilt on the next lookup
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[tax_uuid] = (time.monotonic() + ttl, compiled)
+            self._entries.move_to_end(tax_uuid)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tax_uuid: str):
+        with self._lock:
+            self._entries.pop(tax_uuid, None)
+            self._generation += 1
+        if self.snapshot is not None:
+            self.snapshot.invalidate(tax_uuid)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+# the index of the current app, each app built by create_app has its own
+rate_index = LocalProxy(lambda: current_app.extensions["rate_index"])
+
+
+def init_app(app):
+    app.extensions["rate_index"] = RateIndex()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""Compact binary snapshot of every compiled tax, memory-mapped read-only by the workers.
+
+Layout, little-endian:
+
+    header   magic, format version, build time, change sequence and the section offsets
+    index    one entry per tax sorted by the bytes of its uuid: uuid, company and default rate
+             as references into the string blob, followed by the range of its rate records
+    records  (flags, country, rate, rule name) per resolvable key of a tax, the keys
+             `compile_tax` keeps; flags hold b2c and whether the record has a country.
+             The records of a tax are sorted by (b2c, has country, country bytes)
+    strings  utf-8 blob every reference points into
+
+The change sequence is the last change of the change feed that is contained in the file,
+taxes with later changes are served from the database instead. So are taxes with a country
+that does not fit the 3 bytes of a record, they are left out of the file.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from pluto.models import Tax, TaxChange, db
+from pluto.rateIndex import compile_tax, rule_rows_query
+from pluto.readReplicas import on_primary
+
+MAGIC = b"PLRS"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHdQIIQQQ")
+INDEX_ENTRY = struct.Struct("<IHIHIHII")
+RECORD = struct.Struct("<B3sIHIH")
+RECORD_KEY = struct.Struct("<B3s")
+
+B2C_FLAG = 1
+COUNTRY_FLAG = 2
+
+COMPILE_BATCH = 1000
+
+
+class InvalidSnapshot(Exception):
+    pass
+
+
+class SnapshotTax:
+    """Rates of one tax read straight from the mapped file, same interface as CompiledTax."""
+    __slots__ = ("_snapshot", "company_id", "default_tax", "_first", "_count")
+
+    def __init__(self, snapshot, company_id, default_tax, first, count):
+        self._snapshot = snapshot
+        self.company_id = company_id
+        self.default_tax = default_tax
+        self._first = first
+        self._count = count
+
+    def _find(self, b2c: bool, country):
+        """Binary search of the records of this tax, country is the padded id or None for the fallback."""
+        target = (b2c, country is not None, country or b"")
+        low, high = self._first, self._first + self._count
+        while low < high:
+            middle = (low + high) // 2
+            key = self._snapshot.record_key(middle)
+            if key < target:
+                low = middle + 1
+            elif key > target:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def resolve(self, b2c: bool, country_id):
+        position = None
+        if _fits(country_id):
+            # a country that does not fit is in none of the records, as the tax would not be in the file
+            position = self._find(b2c, _padded(country_id))
+        if position is None:
+            position = self._find(b2c, None)
+        if position is None:
+            return self.default_tax, ""
+
+        _, _, value, name = self._snapshot.record(position)
+        return value, name
+
+
+def _fits(country_id):
+    if not isinstance(country_id, str):
+        return False
+    encoded = country_id.encode("utf-8")
+    # the padding would make "DE" and "DE\0" the same country
+    return 0 < len(encoded) <= 3 and b"\0" not in encoded
+
+
+def _padded(country_id):
+    return country_id.encode("utf-8").ljust(3, b"\0")
+
+
+class SnapshotFile:
+    """One published snapshot, mapped read-only. The mapping is released with the last reference."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            raise InvalidSnapshot(f"{path} is too short for a rate snapshot")
+        magic, version, _, self.built_at, self.change_sequence, self.tax_count, self.record_count, \
+            self._index, self._records, self._strings = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise InvalidSnapshot(f"{path} is not a rate snapshot of format {FORMAT_VERSION}")
+        if self._index + self.tax_count * INDEX_ENTRY.size > self._records or \
+                self._records + self.record_count * RECORD.size > self._strings or self._strings > len(self._map):
+            raise InvalidSnapshot(f"{path} is truncated")
+
+    def _string(self, offset, length):
+        start = self._strings + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def record_key(self, position):
+        """(b2c, has country, country) of a record, the order of the records of a tax."""
+        flags, country = RECORD_KEY.unpack_from(self._map, self._records + position * RECORD.size)
+        if flags & COUNTRY_FLAG:
+            return bool(flags & B2C_FLAG), True, country
+        return bool(flags & B2C_FLAG), False, b""
+
+    def record(self, position):
+        flags, country, value_offset, value_length, name_offset, name_length = \
+            RECORD.unpack_from(self._map, self._records + position * RECORD.size)
+        return flags, country, Decimal(self._string(value_offset, value_length)), \
+            self._string(name_offset, name_length)
+
+    def get(self, tax_uuid: str):
+        """Binary search of the index, None if the tax is not in the snapshot."""
+        key = tax_uuid.encode("utf-8")
+        low, high = 0, self.tax_count
+        while low < high:
+            middle = (low + high) // 2
+            entry = INDEX_ENTRY.unpack_from(self._map, self._index + middle * INDEX_ENTRY.size)
+            start = self._strings + entry[0]
+            candidate = self._map[start:start + entry[1]]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return SnapshotTax(self, self._string(entry[2], entry[3]),
+                                   Decimal(self._string(entry[4], entry[5])), entry[6], entry[7])
+        return None
+
+
+class RateSnapshot:
+    """The snapshot a worker serves from, swapped when a new file is published at the same path.
+
+    The file is stat'ed at most every check interval. On the same check the taxes changed
+    after the snapshot was compiled are read from the change feed; those, and the taxes
+    this process invalidated since, are left to the database.
+    """
+
+    def __init__(self, path, check_interval, max_age, logger=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.logger = logger
+        self._file = None
+        self._stat = None
+        self._changed = frozenset()
+        self._invalidated = set()
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            invalidated = set(self._invalidated)
+
+        try:
+            stat = os.stat(self.path)
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = None
+
+        snapshot = self._file
+        if key != self._stat:
+            snapshot = None
+            if key is not None:
+                try:
+                    snapshot = SnapshotFile(self.path)
+                    self._log(f"loaded rate snapshot {self.path} with {snapshot.tax_count} taxes")
+                except (OSError, ValueError, InvalidSnapshot) as e:
+                    self._log(f"could not load rate snapshot --> {e}")
+                    snapshot = self._file
+
+        if snapshot is not None and time.time() - snapshot.built_at > self.max_age:
+            self._log(f"rate snapshot {self.path} is older than {self.max_age}s, not using it")
+            snapshot = None
+
+        changed = frozenset()
+        if snapshot is not None:
+            try:
+                # a lagging replica would not list the latest changes yet
+                with on_primary():
+                    changed = frozenset(tax_uuid for tax_uuid, in db.session.query(TaxChange.tax_uuid)
+                                        .filter(TaxChange.id > snapshot.change_sequence).distinct())
+            except Exception:
+                with self._lock:
+                    self._next_check = 0.0
+                raise
+
+        with self._lock:
+            self._file, self._stat, self._changed = snapshot, key, changed
+            # invalidations from before the query are part of its result
+            self._invalidated -= invalidated
+
+    def get_many(self, tax_uuids):
+        """The taxes served by the snapshot, the others are left to the caller."""
+        self._refresh()
+        with self._lock:
+            snapshot, changed, invalidated = self._file, self._changed, set(self._invalidated)
+        if snapshot is None:
+            return {}
+
+        found = {}
+        for tax_uuid in tax_uuids:
+            if tax_uuid in changed or tax_uuid in invalidated:
+                continue
+            tax = snapshot.get(tax_uuid)
+            if tax is not None:
+                found[tax_uuid] = tax
+        return found
+
+    def invalidate(self, tax_uuid: str):
+        with self._lock:
+            self._invalidated.add(tax_uuid)
+
+
+def compile_snapshot(path):
+    """Writes the snapshot of every tax next to path and moves it into place.
+
+    Returns the number of taxes and rate records written.
+    """
+    # changes become visible in sequence order, the taxes read afterwards contain every one up to here
+    change_sequence = db.session.query(func.max(TaxChange.id)).scalar() or 0
+
+    strings = bytearray()
+    string_offsets = {}
+
+    def reference(value):
+        encoded = value.encode("utf-8")
+        if encoded not in string_offsets:
+            string_offsets[encoded] = len(strings)
+            strings.extend(encoded)
+        return string_offsets[encoded], len(encoded)
+
+    taxes = db.session.query(Tax.id, Tax.tax_uuid, Tax.company_id, Tax.default_tax).all()
+    compiled = []
+    for start in range(0, len(taxes), COMPILE_BATCH):
+        batch = taxes[start:start + COMPILE_BATCH]
+        rows = {tax.id: [] for tax in batch}
+        for tax_id, *row in rule_rows_query(list(rows)):
+            rows[tax_id].append(row)
+        for tax in batch:
+            compiled.append((tax.tax_uuid.encode("utf-8"),
+                             compile_tax(tax.id, tax.company_id, tax.default_tax, rows[tax.id])))
+    compiled.sort(key=lambda item: item[0])
+
+    # taxes with a country a record cannot hold are left to the database
+    compiled = [(tax_uuid, tax) for tax_uuid, tax in compiled
+                if all(country_id is None or _fits(country_id) for _, country_id in tax.rates)]
+
+    index = bytearray()
+    records = bytearray()
+    record_count = 0
+    for tax_uuid, tax in compiled:
+        keys = list(tax.rates)
+        keys.sort(key=lambda key: (key[0], key[1] is not None, _padded(key[1]) if key[1] is not None else b""))
+        for b2c, country_id in keys:
+            value, name = tax.rates[(b2c, country_id)]
+            flags = (B2C_FLAG if b2c else 0) | (COUNTRY_FLAG if country_id is not None else 0)
+            country = _padded(country_id) if country_id is not None else b"\0\0\0"
+            records.extend(RECORD.pack(flags, country, *reference(str(value)), *reference(name)))
+
+        index.extend(INDEX_ENTRY.pack(*reference(tax_uuid.decode("utf-8")), *reference(tax.company_id),
+                                      *reference(str(tax.default_tax)), record_count, len(keys)))
+        record_count += len(keys)
+
+    index_offset = HEADER.size
+    records_offset = index_offset + len(index)
+    strings_offset = records_offset + len(records)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, time.time(), change_sequence, len(compiled), record_count,
+                         index_offset, records_offset, strings_offset)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(header)
+        f.write(index)
+        f.write(records)
+        f.write(strings)
+        f.flush()
+        os.fsync(f.fileno())
+    # workers holding the old file keep their mapping until they swap
+    os.replace(temporary, path)
+
+    return len(compiled), record_count
+
+
+def init_app(app):
+    """Serves the rate lookups from the snapshot at RATE_SNAPSHOT_PATH, if one is configured."""
+    if not app.config.get("RATE_SNAPSHOT_PATH"):
+        return
+
+    app.extensions["rate_index"].snapshot = RateSnapshot(app.config.get("RATE_SNAPSHOT_PATH"),
+                                                         app.config.get("RATE_SNAPSHOT_CHECK_INTERVAL"),
+                                                         app.config.get("RATE_SNAPSHOT_MAX_AGE"), app.logger)
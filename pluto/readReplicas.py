@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import contextlib
+import datetime
+import functools
+import hashlib
+import math
+import random
+import time
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import orm
+from sqlalchemy.exc import SQLAlchemyError
+
+# SQLALCHEMY_BINDS entries with this prefix are read replicas of the primary database
+REPLICA_BIND_PREFIX = "replica_"
+
+
+class RoutingSession(SignallingSession):
+    """Sends the statements of read-only views to the replica picked for the request.
+
+    Flushes always go to the primary, so a read-only view that writes after all does not
+    write to a replica.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        if has_app_context() and not self._flushing:
+            bind_key = g.get("replica_bind")
+            if bind_key is not None:
+                return get_state(self.app).db.get_engine(self.app, bind=bind_key)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+# after a write the response also carries its time, callers that send it back (header or cookie) stay on
+# the primary without the lookup of their write marks
+LAST_WRITE_HEADER = "x-pluto-last-write"
+LAST_WRITE_COOKIE = "pluto_last_write"
+
+
+def mark_keys(transaction_id, user_uuid, company_id):
+    """Keys of the write marks of a transaction id and of a user in a company."""
+    keys = []
+    if transaction_id:
+        keys.append(("transaction", transaction_id))
+    if user_uuid and company_id:
+        keys.append(("user", user_uuid, company_id))
+    return [hashlib.sha1("\0".join(key).encode()).hexdigest() for key in keys]
+
+
+def _last_write():
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _sent_recent_write(window):
+    written = _last_write()
+    # tolerates clocks of other hosts running ahead by up to the window
+    return written is not None and abs(time.time() - written) < window
+
+
+def _marked_recent_write(company_id, window):
+    from pluto.models import ReplicaWriteMark, db
+
+    keys = mark_keys(request.headers.get("x-transactionid"), request.headers.get("x-user-uuid"), company_id)
+    if not keys:
+        return False
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=window)
+    # runs before a replica is picked, so on the primary
+    return db.session.query(ReplicaWriteMark.id).filter(ReplicaWriteMark.mark_key.in_(keys))\
+        .filter(ReplicaWriteMark.written_at > cutoff).first() is not None
+
+
+def _is_sticky(company_id):
+    window = current_app.config.get("REPLICA_STICKY_SECONDS")
+    if window <= 0:
+        return False
+    return _sent_recent_write(window) or _marked_recent_write(company_id, window)
+
+
+def replica_binds(app):
+    return sorted(key for key in (app.config.get("SQLALCHEMY_BINDS") or {}) if key.startswith(REPLICA_BIND_PREFIX))
+
+
+def read_only(view):
+    """Runs the view against one of the replicas, unless the caller wrote within the sticky window."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        binds = current_app.extensions.get("read_replicas")
+        if binds and not _is_sticky(kwargs.get("company_id")):
+            g.replica_bind = random.choice(binds)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def on_primary():
+    """Runs the statements of the block against the primary, also inside a read-only view."""
+    bind_key = g.pop("replica_bind", None) if has_app_context() else None
+    try:
+        yield
+    finally:
+        if bind_key is not None:
+            g.replica_bind = bind_key
+
+
+def mark_write(transaction_id, user_uuid, company_id):
+    """Keeps the following reads of this transaction id and of the user in the company on the primary.
+
+    Called after the write committed; a mark that cannot be stored is logged, the write stands.
+    """
+    if not current_app.extensions.get("read_replicas"):
+        return
+    g.last_write = time.time()
+
+    from pluto.models import ReplicaWriteMark, db
+
+    keys = mark_keys(transaction_id, user_uuid, company_id)
+    window = current_app.config.get("REPLICA_STICKY_SECONDS")
+    if not keys or window <= 0:
+        return
+    marks = ReplicaWriteMark.__table__
+    now = datetime.datetime.utcnow()
+    try:
+        # a connection of its own, the objects of the request session are not expired by it
+        with db.engine.begin() as connection:
+            connection.execute(marks.delete().where(marks.c.written_at < now - datetime.timedelta(seconds=window)))
+            connection.execute(marks.insert(), [{"mark_key": key, "written_at": now} for key in keys])
+    except SQLAlchemyError as e:
+        current_app.logger.warning(f"{transaction_id}: could not mark the write for the read replicas --> {e}")
+
+
+def _send_last_write(response):
+    written = g.get("last_write")
+    if written is not None:
+        value = f"{written:.3f}"
+        response.headers[LAST_WRITE_HEADER] = value
+        response.set_cookie(LAST_WRITE_COOKIE, value, max_age=math.ceil(current_app.config.get("REPLICA_STICKY_SECONDS")),
+                            httponly=True)
+    return response
+
+
+def init_app(app):
+    """Routes the read-only views to the replica binds of SQLALCHEMY_BINDS, if any are configured."""
+    binds = replica_binds(app)
+    app.extensions["read_replicas"] = binds
+    if binds:
+        app.after_request(_send_last_write)
+        app.logger.info(f"routing read-only views to {len(binds)} replicas")
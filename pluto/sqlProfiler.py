@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import re
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\((?:\s*(?:\?|%\([^)]+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\([^)]+\)s|%s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement text with literals and IN lists collapsed, equal for every run of the same query."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _LITERALS.sub("?", statement)
+    return _PLACEHOLDER_LISTS.sub("(...)", statement)
+
+
+def _transaction_id():
+    return g.get("transaction_id") or request.headers.get("x-transactionid", "")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("pluto_profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("pluto_profile_start")
+    if not started or not has_request_context():
+        if started:
+            started.pop()
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+
+    profile = g.get("sql_profile")
+    if profile is None:
+        profile = g.sql_profile = {"count": 0, "time_ms": 0.0, "statements": {}}
+    profile["count"] += 1
+    profile["time_ms"] += elapsed_ms
+    key = fingerprint(statement)
+    stats = profile["statements"].setdefault(key, [0, 0.0])
+    stats[0] += 1
+    stats[1] += elapsed_ms
+
+    config = current_app.config
+    if elapsed_ms >= config.get("SQL_SLOW_QUERY_MS"):
+        current_app.logger.warning(
+            f"{_transaction_id()}: slow query took {elapsed_ms:.1f}ms --> {_WHITESPACE.sub(' ', statement)} "
+            f"parameters: {repr(parameters)[:config.get('SQL_SLOW_QUERY_PARAMETER_LENGTH')]}")
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("pluto_profile_start"):
+        connection.info["pluto_profile_start"].pop()
+
+
+def _log_summary(response):
+    profile = g.pop("sql_profile", None)
+    if profile is None:
+        return response
+
+    config = current_app.config
+    if profile["count"] <= config.get("SQL_PROFILE_QUERY_BUDGET") and \
+            profile["time_ms"] <= config.get("SQL_PROFILE_TIME_BUDGET_MS"):
+        return response
+
+    statements = sorted(profile["statements"].items(), key=lambda item: (-item[1][0], -item[1][1]))
+    lines = [f"  {count}x {time_ms:.1f}ms {statement}" for statement, (count, time_ms) in statements[:10]]
+    current_app.logger.warning(
+        f"{_transaction_id()}: {request.method} {request.path} ran {profile['count']} queries in "
+        f"{profile['time_ms']:.1f}ms, over the budget of {config.get('SQL_PROFILE_QUERY_BUDGET')} queries / "
+        f"{config.get('SQL_PROFILE_TIME_BUDGET_MS')}ms\n" + "\n".join(lines))
+    return response
+
+
+def init_app(app):
+    """Profiles the statements of every request when SQL_PROFILING_ENABLED is set."""
+    if not app.config.get("SQL_PROFILING_ENABLED"):
+        return
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    app.after_request(_log_summary)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+import decimal
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+from pluto.exceptions.calculation_exceptions import InvalidCalculation
+
+ROUNDING_MODES = {name: getattr(decimal, name) for name in (
+    "ROUND_HALF_UP", "ROUND_HALF_EVEN", "ROUND_HALF_DOWN", "ROUND_UP", "ROUND_DOWN", "ROUND_CEILING", "ROUND_FLOOR"
+)}
+MAX_DECIMAL_PLACES = 6
+
+# enough digits for any amount a Numeric column or a json body carries, quantize fails instead of rounding twice
+_CONTEXT = decimal.Context(prec=60, traps=[InvalidOperation, decimal.DivisionByZero, decimal.Overflow])
+
+
+def _amount(value):
+    # floats are taken by their shortest repr, amounts sent as strings are exact
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    return number if number.is_finite() else None
+
+
+def parse_items(items, max_errors):
+    """Validates the line items, returns (tax_id, b2c, country, net_amount) per item.
+
+    country is a string or None, it is used as it is for the rate lookup.
+
+    Raises InvalidCalculation with every problem found, up to max_errors.
+    """
+    errors = []
+    lines = []
+
+    def error(index, message):
+        errors.append({"line": index, "message": message})
+        if len(errors) >= max_errors:
+            raise InvalidCalculation("too many invalid line items", errors)
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("tax_id"), str) \
+                or "country" not in item or "tax_option" not in item:
+            error(index, "please submit tax_id, country, tax_option and net_amount")
+            continue
+
+        if item["country"] is not None and not isinstance(item["country"], str):
+            error(index, "country has to be a country id")
+            continue
+
+        net_amount = _amount(item.get("net_amount"))
+        if net_amount is None:
+            error(index, "net_amount has to be a decimal number")
+            continue
+
+        lines.append((item["tax_id"], item["tax_option"] == "b2c", item["country"], net_amount))
+
+    if errors:
+        raise InvalidCalculation("the submitted line items are not valid", errors)
+    return lines
+
+
+def calculate(lines, compiled_taxes, company_id, decimal_places, rounding):
+    """Tax and gross amount of every line and their totals per tax and rate.
+
+    Rates are resolved once per distinct (tax, b2c, country). The tax of each line is
+    rounded to decimal_places with the given rounding mode and the totals are the exact
+    sums of the rounded lines, so they always match the lines of the invoice.
+    """
+    exponent = Decimal(1).scaleb(-decimal_places)
+    rounding = ROUNDING_MODES[rounding]
+
+    rates = {}
+    errors = []
+    for index, (tax_id, b2c, country, _) in enumerate(lines):
+        key = (tax_id, b2c, country)
+        if key in rates:
+            continue
+        compiled_tax = compiled_taxes.get(tax_id)
+        if compiled_tax is None or compiled_tax.company_id != company_id:
+            errors.append({"line": index, "message": f"tax {tax_id} does not exist"})
+            rates[key] = None
+            continue
+        rate, name = compiled_tax.resolve(b2c, country)
+        rates[key] = Decimal(rate), name
+
+    if errors:
+        raise InvalidCalculation("the submitted line items reference unknown taxes", errors)
+
+    results = []
+    totals = OrderedDict()
+    total_net = total_tax = Decimal(0)
+    try:
+        for index, (tax_id, b2c, country, net_amount) in enumerate(lines):
+            rate, name = rates[(tax_id, b2c, country)]
+            tax_amount = _CONTEXT.multiply(net_amount, rate.scaleb(-2)).quantize(exponent, rounding, _CONTEXT)
+            if not tax_amount:
+                # credit lines at a zero rate would read -0.00
+                tax_amount = tax_amount.copy_abs()
+            gross_amount = _CONTEXT.add(net_amount, tax_amount)
+
+            results.append({
+                'line': index,
+                'tax_id': tax_id,
+                'tax': name,
+                'tax_rate': rate,
+                'net_amount': format(net_amount, "f"),
+                'tax_amount': format(tax_amount, "f"),
+                'gross_amount': format(gross_amount, "f")
+            })
+
+            group = totals.get((tax_id, name, rate))
+            if group is None:
+                group = totals[(tax_id, name, rate)] = [0, Decimal(0), Decimal(0)]
+            group[0] += 1
+            group[1] = _CONTEXT.add(group[1], net_amount)
+            group[2] = _CONTEXT.add(group[2], tax_amount)
+            total_net = _CONTEXT.add(total_net, net_amount)
+            total_tax = _CONTEXT.add(total_tax, tax_amount)
+    except decimal.DecimalException:
+        raise InvalidCalculation("the submitted line items are not valid",
+                                 [{"line": index, "message": "net_amount is too large"}])
+
+    return results, [{
+        'tax_id': tax_id,
+        'tax': name,
+        'tax_rate': rate,
+        'lines': lines_count,
+        'net_amount': format(net, "f"),
+        'tax_amount': format(tax, "f"),
+        'gross_amount': format(_CONTEXT.add(net, tax), "f")
+    } for (tax_id, name, rate), (lines_count, net, tax) in totals.items()], {
+        'net_amount': format(total_net, "f"),
+        'tax_amount': format(total_tax, "f"),
+        'gross_amount': format(_CONTEXT.add(total_net, total_tax), "f")
+    }
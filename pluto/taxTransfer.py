@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+import csv
+import io
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from pluto.changeFeed import TAX_CREATED, lock_sequence
+from pluto.exceptions.transfer_exceptions import InvalidImportDocument
+from pluto.fastJson import dumps
+from pluto.models import Tax, TaxChange, TaxRule, TaxRuleCountry, db
+
+CSV_HEADER = ["tax_id", "tax_name", "default_tax", "rule_id", "rule_name", "value", "b2c_rule", "country_id"]
+
+
+def _export_rows(company_id, yield_per):
+    return db.session.query(
+        Tax.id, Tax.tax_uuid, Tax.name, Tax.default_tax,
+        TaxRule.id, TaxRule.tax_rule_uuid, TaxRule.tax_rule_name, TaxRule.value, TaxRule.b2c_rule,
+        TaxRuleCountry.country_id
+    ).outerjoin(TaxRule, TaxRule.tax_id == Tax.id)\
+        .outerjoin(TaxRuleCountry, TaxRuleCountry.tax_rule_id == TaxRule.id)\
+        .filter(Tax.company_id == company_id)\
+        .order_by(Tax.id, TaxRule.id, TaxRuleCountry.id)\
+        .yield_per(yield_per)
+
+
+def export_ndjson(company_id, yield_per):
+    """Yields one line per tax followed by one line per rule of that tax.
+
+    Only the countries of the rule that is currently written are held in memory.
+    """
+    current_tax = None
+    rule = None
+
+    for tax_id, tax_uuid, name, default_tax, rule_id, rule_uuid, rule_name, value, b2c_rule, country_id \
+            in _export_rows(company_id, yield_per):
+        if rule is not None and rule_id != rule["_id"]:
+            yield _rule_line(rule)
+            rule = None
+
+        if tax_id != current_tax:
+            current_tax = tax_id
+            yield dumps({
+                "type": "tax",
+                "tax_id": tax_uuid,
+                "name": name,
+                "default_tax": str(default_tax)
+            }) + "\n"
+
+        if rule_id is not None and rule is None:
+            rule = {
+                "_id": rule_id,
+                "type": "rule",
+                "tax_id": tax_uuid,
+                "rule_id": rule_uuid,
+                "name": rule_name,
+                "value": str(value),
+                "b2c_rule": b2c_rule,
+                "countries": []
+            }
+        if country_id is not None:
+            rule["countries"].append(country_id)
+
+    if rule is not None:
+        yield _rule_line(rule)
+
+
+def _rule_line(rule):
+    del rule["_id"]
+    return dumps(rule) + "\n"
+
+
+def export_csv(company_id, yield_per):
+    """Yields one csv row per tax, rule and country combination."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+
+    for count, (_, tax_uuid, name, default_tax, _, rule_uuid, rule_name, value, b2c_rule, country_id) \
+            in enumerate(_export_rows(company_id, yield_per), 1):
+        writer.writerow([tax_uuid, name, default_tax, rule_uuid or "", rule_name or "",
+                         "" if value is None else value, "" if b2c_rule is None else b2c_rule, country_id or ""])
+        if count % yield_per == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def _parse_decimal(value):
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    return number if number.is_finite() else None
+
+
+def validate_document(lines, spool, max_errors):
+    """Validates an ndjson import document in one pass and copies it into `spool`.
+
+    Rules have to follow the tax they belong to, as in an export, so only the rules of the
+    current tax are tracked. Returns the set of referenced countries, raises InvalidImportDocument.
+    """
+    errors = []
+    countries = set()
+    seen_taxes = set()
+    current_tax = None
+    used = set()
+
+    def error(line_number, message):
+        errors.append({"line": line_number, "message": message})
+        if len(errors) >= max_errors:
+            raise InvalidImportDocument("too many errors in import document", errors)
+
+    for line_number, raw in enumerate(lines, 1):
+        spool.write(raw)
+        if not raw.strip():
+            continue
+
+        try:
+            record = json.loads(raw.decode("utf-8"))
+        except ValueError:
+            error(line_number, "line is not valid json")
+            continue
+
+        if not isinstance(record, dict) or record.get("type") not in ("tax", "rule"):
+            error(line_number, "line has to be a tax or rule object")
+            continue
+
+        if record["type"] == "tax":
+            tax_id = record.get("tax_id")
+            if not isinstance(tax_id, str) or not tax_id:
+                error(line_number, "tax_id is missing")
+                # its rules are reported as not following a tax
+                current_tax = None
+                continue
+            if tax_id in seen_taxes:
+                error(line_number, f"tax {tax_id} is declared twice")
+            if not isinstance(record.get("name"), str) or not record["name"] or len(record["name"]) > 250:
+                error(line_number, "name is missing or too long")
+            if _parse_decimal(record.get("default_tax")) is None:
+                error(line_number, "default_tax is not a number")
+
+            seen_taxes.add(tax_id)
+            current_tax = tax_id
+            used = set()
+            continue
+
+        if record.get("tax_id") != current_tax or current_tax is None:
+            error(line_number, "rule has to follow the tax it belongs to")
+        if not isinstance(record.get("name"), str) or not record["name"] or len(record["name"]) > 250:
+            error(line_number, "name is missing or too long")
+        if _parse_decimal(record.get("value")) is None:
+            error(line_number, "value is not a number")
+        if not isinstance(record.get("b2c_rule"), bool):
+            error(line_number, "b2c_rule has to be true or false")
+
+        rule_countries = record.get("countries", [])
+        if not isinstance(rule_countries, list) or \
+                not all(isinstance(country, str) and 0 < len(country) <= 3 for country in rule_countries):
+            error(line_number, "countries has to be a list of country ids")
+            continue
+
+        countries.update(rule_countries)
+
+        b2c = record.get("b2c_rule")
+        if not isinstance(b2c, bool):
+            continue
+        for key in ([(b2c, country) for country in rule_countries] or [(b2c, None)]):
+            if key in used:
+                if key[1] is None:
+                    error(line_number, "there is already a rule without countries with this settings")
+                else:
+                    error(line_number, f"country {key[1]} exists already with this settings")
+            used.add(key)
+
+    if errors:
+        raise InvalidImportDocument("import document is not valid", errors)
+
+    return countries
+
+
+def write_document(company_id, lines, chunk_size):
+    """Inserts a validated document in chunks, the caller commits or rolls back.
+
+    Returns the number of written taxes, rules and countries and the uuids given to the taxes.
+    """
+    written = {"taxes": 0, "rules": 0, "countries": 0}
+    tax_ids = {}
+    current_tax = None
+    chunk = []
+
+    def flush():
+        nonlocal current_tax
+        tax_rows = []
+        for record in chunk:
+            if record["type"] == "tax":
+                tax_ids[record["tax_id"]] = uuid.uuid4().hex
+                tax_rows.append({
+                    "company_id": company_id,
+                    "tax_uuid": tax_ids[record["tax_id"]],
+                    "name": record["name"],
+                    "default_tax": _parse_decimal(record["default_tax"])
+                })
+        if tax_rows:
+            db.session.execute(Tax.__table__.insert(), tax_rows)
+        db_tax_ids = dict(db.session.query(Tax.tax_uuid, Tax.id).filter(
+            Tax.tax_uuid.in_([row["tax_uuid"] for row in tax_rows]))) if tax_rows else {}
+
+        rule_rows = []
+        rule_countries = []
+        for record in chunk:
+            if record["type"] == "tax":
+                current_tax = db_tax_ids[tax_ids[record["tax_id"]]]
+                continue
+            rule_uuid = uuid.uuid4().hex
+            rule_rows.append({
+                "tax_rule_name": record["name"],
+                "tax_rule_uuid": rule_uuid,
+                "tax_id": current_tax,
+                "value": _parse_decimal(record["value"]),
+                "b2c_rule": record["b2c_rule"]
+            })
+            rule_countries.append((rule_uuid, current_tax, record["b2c_rule"], record.get("countries", [])))
+        if rule_rows:
+            db.session.execute(TaxRule.__table__.insert(), rule_rows)
+            db_rule_ids = dict(db.session.query(TaxRule.tax_rule_uuid, TaxRule.id).filter(
+                TaxRule.tax_rule_uuid.in_([row["tax_rule_uuid"] for row in rule_rows])))
+
+            country_rows = [{
+                "tax_rule_id": db_rule_ids[rule_uuid],
+                "country_id": country,
+                "tax_id": tax_id,
+                "b2c_rule": b2c
+            } for rule_uuid, tax_id, b2c, countries in rule_countries for country in countries]
+            if country_rows:
+                db.session.execute(TaxRuleCountry.__table__.insert(), country_rows)
+            written["countries"] += len(country_rows)
+
+        written["taxes"] += len(tax_rows)
+        written["rules"] += len(rule_rows)
+        del chunk[:]
+
+    for raw in lines:
+        if not raw.strip():
+            continue
+        chunk.append(json.loads(raw.decode("utf-8")))
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    # numbered last, the sequence stays locked from here until the caller commits
+    lock_sequence()
+    change_rows = [{"company_id": company_id, "tax_uuid": tax_uuid, "action": TAX_CREATED}
+                   for tax_uuid in tax_ids.values()]
+    for start in range(0, len(change_rows), chunk_size):
+        db.session.execute(TaxChange.__table__.insert(), change_rows[start:start + chunk_size])
+
+    return written, tax_ids
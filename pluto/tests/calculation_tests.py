@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import json
+import os
+import tempfile
+import unittest
+
+from app import create_app
+from config import TestingConfig
+from pluto.extensions import db
+from pluto.models import Tax, TaxRule, TaxRuleCountry
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+
+COMPANY_ID = "calculation"
+HEADERS = {"x-user-id": "1", "x-user-uuid": "calculation-user", "x-transactionid": "calculation"}
+MAX_ERRORS = 3
+
+
+class CalculationTests(unittest.TestCase):
+    """POST /tax/calculate rounds every line on its own and sums the rounded lines."""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.database
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+            CALCULATION_MAX_ERRORS = MAX_ERRORS
+
+        self.app = create_app(Config)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.standard = self.add_tax("standard", 10, [("reduced", 5, True, ["DE"]), ("zero", 0, True, ["AT"]),
+                                                      ("export", 0, False, [])])
+        self.foreign = self.add_tax("foreign", 10, [], company_id="other-company")
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.remove(self.database)
+
+    def add_tax(self, name, default_tax, rules, company_id=COMPANY_ID):
+        tax = Tax(company_id, name, default_tax)
+        db.session.add(tax)
+        db.session.flush()
+        for rule_name, value, b2c, countries in rules:
+            rule = TaxRule(tax.id, value, rule_name, b2c_rule=b2c)
+            for country_id in countries:
+                rule.countries.append(TaxRuleCountry(country_id, tax.id, b2c))
+            db.session.add(rule)
+        db.session.commit()
+        return tax.tax_uuid
+
+    def item(self, net_amount, tax_id=None, tax_option="b2c", country="FR"):
+        return {"tax_id": tax_id or self.standard, "tax_option": tax_option, "country": country,
+                "net_amount": net_amount}
+
+    def calculate(self, items, status_code=200, **options):
+        response = self.client.post(f"/tax/calculate/{COMPANY_ID}", headers=HEADERS,
+                                    data=json.dumps(dict(options, items=items)), content_type="application/json",
+                                    environ_base={PERMISSION_ENVIRON_KEY: None})
+        self.assertEqual(response.status_code, status_code)
+        return json.loads(response.data.decode())
+
+    def tax_amounts(self, items, **options):
+        return [line["tax_amount"] for line in self.calculate(items, **options)["data"]]
+
+    def test_rates(self):
+        data = self.calculate([self.item("100"), self.item("100", country="DE"), self.item("100", country=None),
+                               self.item("100", tax_option="b2b"), self.item("100", tax_option="b2b", country="DE")])
+        self.assertEqual([(line["tax"], line["tax_amount"], line["gross_amount"]) for line in data["data"]], [
+            ("", "10.00", "110.00"),
+            ("reduced", "5.00", "105.00"),
+            ("", "10.00", "110.00"),
+            ("export", "0.00", "100.00"),
+            ("export", "0.00", "100.00")
+        ])
+
+    def test_rounding_modes(self):
+        expected = {
+            "ROUND_HALF_UP": ["0.03", "-0.03"],
+            "ROUND_HALF_EVEN": ["0.02", "-0.02"],
+            "ROUND_HALF_DOWN": ["0.02", "-0.02"],
+            "ROUND_UP": ["0.03", "-0.03"],
+            "ROUND_DOWN": ["0.02", "-0.02"],
+            "ROUND_CEILING": ["0.03", "-0.02"],
+            "ROUND_FLOOR": ["0.02", "-0.03"]
+        }
+        for rounding, amounts in expected.items():
+            with self.subTest(rounding=rounding):
+                self.assertEqual(self.tax_amounts([self.item("0.25"), self.item("-0.25")], rounding=rounding),
+                                 amounts)
+
+    def test_decimal_places(self):
+        self.assertEqual(self.tax_amounts([self.item("1.2345")], decimal_places=0), ["0"])
+        self.assertEqual(self.tax_amounts([self.item("1.2345")], decimal_places=4), ["0.1235"])
+        self.assertEqual(self.tax_amounts([self.item(0.1)]), ["0.01"])
+
+    def test_negative_zero(self):
+        # a credit at a zero rate and a credit rounded away both read 0.00
+        self.assertEqual(self.tax_amounts([self.item("-100", country="AT"), self.item("-0.01")]), ["0.00", "0.00"])
+
+    def test_totals_sum_rounded_lines(self):
+        data = self.calculate([self.item("0.05") for _ in range(3)] + [self.item("0.05", country="DE")])
+        self.assertEqual(self.tax_amounts([self.item("0.05")]), ["0.01"])
+        self.assertEqual([(group["tax"], group["lines"], group["net_amount"], group["tax_amount"])
+                          for group in data["totals"]], [("", 3, "0.15", "0.03"), ("reduced", 1, "0.05", "0.00")])
+        self.assertEqual(data["total"], {"net_amount": "0.20", "tax_amount": "0.03", "gross_amount": "0.23"})
+
+    def test_unknown_taxes(self):
+        data = self.calculate([self.item("1"), self.item("1", tax_id="missing"), self.item("1", tax_id=self.foreign)],
+                              status_code=400)
+        self.assertEqual(data["errors"], [{"line": 1, "message": "tax missing does not exist"},
+                                          {"line": 2, "message": f"tax {self.foreign} does not exist"}])
+
+    def test_invalid_items(self):
+        data = self.calculate([self.item("1"), self.item("ten"), self.item("NaN"), {"tax_id": self.standard}],
+                              status_code=400)
+        self.assertEqual(data["message"], "too many invalid line items")
+        self.assertEqual([error["line"] for error in data["errors"]], [1, 2, 3])
+
+        data = self.calculate([self.item(True), self.item("1", country=49)], status_code=400)
+        self.assertEqual(data["message"], "the submitted line items are not valid")
+        self.assertEqual(data["errors"], [{"line": 0, "message": "net_amount has to be a decimal number"},
+                                          {"line": 1, "message": "country has to be a country id"}])
+
+    def test_too_large_amount(self):
+        data = self.calculate([self.item("1"), self.item("1e100")], status_code=400)
+        self.assertEqual(data["errors"], [{"line": 1, "message": "net_amount is too large"}])
+
+    def test_invalid_options(self):
+        self.calculate([self.item("1")], status_code=400, rounding="ROUND_05UP")
+        self.calculate([self.item("1")], status_code=400, decimal_places=7)
+        self.calculate([self.item("1")], status_code=400, decimal_places=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import json
+import os
+import tempfile
+import unittest
+
+from app import create_app
+from config import TestingConfig
+from pluto.extensions import db
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+
+COMPANY_ID = "change-feed"
+HEADERS = {"x-user-id": "1", "x-user-uuid": "change-feed-user", "x-transactionid": "change-feed"}
+
+
+class ChangeFeedTests(unittest.TestCase):
+    """GET /tax/changes pages through the committed changes and validates its parameters."""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.database
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+
+        self.app = create_app(Config)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.remove(self.database)
+
+    def request(self, method, path, body=None):
+        return self.client.open(path, method=method, headers=HEADERS, content_type="application/json",
+                                data=json.dumps(body) if body is not None else None,
+                                environ_base={PERMISSION_ENVIRON_KEY: None})
+
+    def fetch_changes(self, query):
+        return self.request("GET", f"/tax/changes/{COMPANY_ID}?{query}")
+
+    def test_changes(self):
+        response = self.request("POST", f"/tax/create/{COMPANY_ID}", {"tax_name": "VAT", "default_tax": 19})
+        self.assertEqual(response.status_code, 200)
+        tax_uuid = json.loads(response.data.decode())["tax_id"]
+
+        response = self.fetch_changes("since=0&wait=0")
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data.decode())
+        self.assertEqual([(change["action"], change["tax_id"]) for change in data["data"]], [("tax_created", tax_uuid)])
+
+        response = self.fetch_changes(f"since={data['next_since']}&wait=0")
+        self.assertEqual(json.loads(response.data.decode())["data"], [])
+
+    def test_invalid_parameters(self):
+        for query in ("wait=nan", "wait=inf", "wait=-inf", "wait=-1", "wait=soon", "since=-1", "limit=0"):
+            with self.subTest(query=query):
+                response = self.fetch_changes(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(json.loads(response.data.decode())["message"],
+                                 "since, limit and wait have to be positive numbers")
+
+
+if __name__ == '__main__':
+    unittest.main()
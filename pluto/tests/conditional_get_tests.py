@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from app import create_app
+from config import TestingConfig
+from pluto.extensions import db
+from pluto.models import Tax, TaxRule, TaxRuleCountry
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+
+COMPANY_ID = "conditional-get"
+HEADERS = {"x-user-id": "1", "x-user-uuid": "conditional-get-user", "x-transactionid": "conditional-get"}
+GEOSERVICE = "http://geo.test/countries"
+
+
+class ConditionalGetTests(unittest.TestCase):
+    """The polled GET endpoints answer a current If-None-Match with a 304, every change to a tax moves its ETag."""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.database
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+            GEOSERVICE = GEOSERVICE
+
+        self.app = create_app(Config)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        # the countries the geo service would answer with
+        catalog = self.app.extensions["country_catalog"]
+        catalog.url = GEOSERVICE
+        catalog.country_ids = frozenset(["DE", "AT", "FR"])
+        catalog.fetched_at = time.time()
+
+        tax = Tax(COMPANY_ID, "VAT", 19)
+        db.session.add(tax)
+        db.session.flush()
+        rule = TaxRule(tax.id, 7, "reduced", b2c_rule=True)
+        rule.countries.append(TaxRuleCountry("DE", tax.id, True))
+        db.session.add(rule)
+        db.session.commit()
+        self.tax_uuid, self.rule_uuid = tax.tax_uuid, rule.tax_rule_uuid
+        self.paths = [f"/tax/all/{COMPANY_ID}", f"/tax/{self.tax_uuid}/{COMPANY_ID}",
+                      f"/tax/rules/{self.tax_uuid}/{COMPANY_ID}"]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.remove(self.database)
+
+    def request(self, method, path, body=None, headers=None):
+        db.session.remove()
+        return self.client.open(path, method=method, headers=dict(HEADERS, **(headers or {})),
+                                data=json.dumps(body) if body is not None else None, content_type="application/json",
+                                environ_base={PERMISSION_ENVIRON_KEY: None})
+
+    def etags(self):
+        etags = {}
+        for path in self.paths:
+            response = self.request("GET", path)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data)
+            etags[path] = response.headers.get("ETag")
+            self.assertTrue(etags[path])
+        return etags
+
+    def version(self):
+        db.session.remove()
+        return Tax.query.filter_by(tax_uuid=self.tax_uuid).one().version
+
+    def assert_not_modified(self, etags):
+        for path, etag in etags.items():
+            with self.subTest(path=path):
+                response = self.request("GET", path, headers={"If-None-Match": etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.data, b"")
+                self.assertEqual(response.headers.get("ETag"), etag)
+
+    def assert_modified(self, etags):
+        for path, etag in etags.items():
+            with self.subTest(path=path):
+                response = self.request("GET", path, headers={"If-None-Match": etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.data)
+                self.assertNotEqual(response.headers.get("ETag"), etag)
+
+    def assert_change_moves_etags(self, method, path, body=None):
+        etags = self.etags()
+        version = self.version()
+        response = self.request(method, path, body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.version(), version + 1)
+        self.assert_modified(etags)
+        self.assert_not_modified(self.etags())
+
+    def test_matching_etag(self):
+        etags = self.etags()
+        self.assert_not_modified(etags)
+        self.assertEqual(etags, self.etags())
+
+        path = self.paths[1]
+        response = self.request("GET", path, headers={"If-None-Match": f"W/{etags[path]}"})
+        self.assertEqual(response.status_code, 304)
+        response = self.request("GET", path, headers={"If-None-Match": '"other"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_string_is_part_of_etag(self):
+        path = f"/tax/all/{COMPANY_ID}"
+        etag = self.etags()[path]
+        response = self.request("GET", path + "?limit=1", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_rule_edit_moves_etags(self):
+        self.assert_change_moves_etags(
+            "PUT", f"/tax/{self.tax_uuid}/create/rule/{COMPANY_ID}?tax_rule_id={self.rule_uuid}",
+            {"rule_name": "reduced", "value": 5, "b2c_rule": True, "b2c_countries": ["DE", "AT"]})
+
+    def test_rule_create_moves_etags(self):
+        self.assert_change_moves_etags(
+            "POST", f"/tax/{self.tax_uuid}/create/rule/{COMPANY_ID}",
+            {"rule_name": "export", "value": 0, "b2c_rule": False, "countries": ["FR"]})
+
+    def test_rule_delete_moves_etags(self):
+        self.assert_change_moves_etags("DELETE", f"/tax/delete/taxgroup/{self.tax_uuid}/{self.rule_uuid}/{COMPANY_ID}")
+
+    def test_tax_edit_moves_etags(self):
+        self.assert_change_moves_etags("POST", f"/tax/edit/{COMPANY_ID}/{self.tax_uuid}",
+                                       {"tax_name": "VAT", "default_tax": 20})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+import json
+import os
+import tempfile
+import unittest
+
+from app import create_app
+from config import TestingConfig
+from pluto.extensions import db
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+
+HEADERS = {"x-user-id": "1", "x-user-uuid": "metrics-user", "x-transactionid": "metrics"}
+
+
+class MetricsTests(unittest.TestCase):
+    """The operational endpoints are served by the app, outside of the tax blueprint."""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.database
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+            METRICS_ENABLED = True
+
+        self.app = create_app(Config)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.remove(self.database)
+
+    def test_metrics(self):
+        self.client.get("/tax/ping")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'pluto_http_requests_total{method="GET",route="/tax/ping",status="200"}', response.data)
+
+    def test_upstream_pools(self):
+        response = self.client.get("/metrics/upstream")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode())["pools"], [])
+
+    def test_upstream_pools_are_not_served_by_tax_blueprint(self):
+        response = self.client.get("/tax/stats/upstream", headers=HEADERS, environ_base={PERMISSION_ENVIRON_KEY: None})
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import event
+
+from app import create_app
+from config import TestingConfig
+from pluto.extensions import db
+from pluto.models import Tax, TaxRule, TaxRuleCountry
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+
+COMPANY_ID = "query-count"
+HEADERS = {"x-user-id": "1", "x-user-uuid": "query-count-user", "x-transactionid": "query-count"}
+COUNTRIES = ["DE", "AT", "FR", "IT", "NL", "BE", "LU", "DK"]
+
+
+class QueryCountTests(unittest.TestCase):
+    """The tax and rule listings must not issue a query per tax, rule or country."""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.database
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+
+        self.app = create_app(Config)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.statements = 0
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            self.statements += 1
+
+        event.listen(db.engine, "before_cursor_execute", count)
+        self.addCleanup(event.remove, db.engine, "before_cursor_execute", count)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.remove(self.database)
+
+    def add_taxes(self, taxes, rules_per_tax):
+        added = []
+        for _ in range(taxes):
+            tax = Tax(COMPANY_ID, "VAT", 19)
+            db.session.add(tax)
+            db.session.flush()
+            for number in range(rules_per_tax):
+                rule = TaxRule(tax.id, 7, f"rule {number}", b2c_rule=number % 2 == 0)
+                # every rule gets its own countries, the pair (tax, b2c) must not repeat one
+                for country_id in COUNTRIES[number // 2 * 2:number // 2 * 2 + 2]:
+                    rule.countries.append(TaxRuleCountry(country_id, tax.id, rule.b2c_rule))
+                db.session.add(rule)
+            added.append(tax.tax_uuid)
+        db.session.commit()
+        return added
+
+    def count_statements(self, path):
+        db.session.remove()
+        self.statements = 0
+        response = self.client.get(path, headers=HEADERS, environ_base={PERMISSION_ENVIRON_KEY: None})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.statements, 0)
+        return self.statements
+
+    def test_tax_listing(self):
+        self.add_taxes(1, 1)
+        few = self.count_statements(f"/tax/all/{COMPANY_ID}")
+        self.add_taxes(20, 6)
+        self.assertEqual(self.count_statements(f"/tax/all/{COMPANY_ID}"), few)
+        self.assertEqual(self.count_statements(f"/tax/all/{COMPANY_ID}?limit=10"), few)
+
+    def test_tax_by_id(self):
+        tax_uuid, = self.add_taxes(1, 1)
+        few = self.count_statements(f"/tax/{tax_uuid}/{COMPANY_ID}")
+        tax_uuid, = self.add_taxes(1, 8)
+        self.assertEqual(self.count_statements(f"/tax/{tax_uuid}/{COMPANY_ID}"), few)
+
+    def test_rule_listing(self):
+        tax_uuid, = self.add_taxes(1, 1)
+        few = self.count_statements(f"/tax/rules/{tax_uuid}/{COMPANY_ID}")
+        tax_uuid, = self.add_taxes(1, 8)
+        self.assertEqual(self.count_statements(f"/tax/rules/{tax_uuid}/{COMPANY_ID}"), few)
+
+
+if __name__ == '__main__':
+    unittest.main()
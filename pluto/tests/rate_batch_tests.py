@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import json
+import os
+import tempfile
+import unittest
+
+from app import create_app
+from config import TestingConfig
+from pluto.extensions import db
+from pluto.models import Tax, TaxRule, TaxRuleCountry
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+
+COMPANY_ID = "rate-batch"
+HEADERS = {"x-user-id": "1", "x-user-uuid": "rate-batch-user", "x-transactionid": "rate-batch"}
+
+
+class RateBatchTests(unittest.TestCase):
+    """POST /tax/test/batch answers every item on its own and only echoes what it resolved."""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.database
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+
+        self.app = create_app(Config)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        tax = Tax(COMPANY_ID, "VAT", 19)
+        db.session.add(tax)
+        db.session.flush()
+        rule = TaxRule(tax.id, 7, "reduced", b2c_rule=True)
+        rule.countries.append(TaxRuleCountry("DE", tax.id, True))
+        db.session.add(rule)
+        db.session.commit()
+        self.tax_uuid = tax.tax_uuid
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.remove(self.database)
+
+    def resolve(self, items):
+        response = self.client.post(f"/tax/test/batch/{COMPANY_ID}", headers=HEADERS,
+                                    data=json.dumps({"items": items}), content_type="application/json",
+                                    environ_base={PERMISSION_ENVIRON_KEY: None})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data.decode())["data"]
+
+    def test_resolve(self):
+        data = self.resolve([
+            {"tax_id": self.tax_uuid, "tax_option": "b2c", "country": "DE"},
+            {"tax_id": self.tax_uuid, "tax_option": "b2b", "country": "DE"},
+            {"tax_id": "missing", "tax_option": "b2c", "country": "DE"}
+        ])
+        self.assertEqual([(item["status_code"], item.get("tax_rate"), item.get("tax")) for item in data],
+                         [(200, 7, "reduced"), (200, 19, ""), (404, None, None)])
+
+    def test_tax_option_is_normalised(self):
+        data = self.resolve([
+            {"tax_id": self.tax_uuid, "tax_option": {"nested": ["b2c"]}, "country": "DE"},
+            {"tax_id": self.tax_uuid, "tax_option": 2 ** 70, "country": "DE"},
+            {"tax_id": self.tax_uuid, "tax_option": "b2c", "country": None}
+        ])
+        self.assertEqual([(item["tax_option"], item["tax_rate"]) for item in data],
+                         [("b2b", 19), ("b2b", 19), ("b2c", 19)])
+
+    def test_invalid_items(self):
+        data = self.resolve([{"tax_id": self.tax_uuid, "tax_option": "b2c", "country": ["DE"]}, {"tax_id": 1}, None])
+        self.assertEqual([(item["status_code"], item["message"]) for item in data], [
+            (400, "country has to be a country id"),
+            (400, "please submit tax_id, country and tax_option"),
+            (400, "please submit tax_id, country and tax_option")
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
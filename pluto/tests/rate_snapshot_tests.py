@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import unittest
+
+from app import create_app
+from config import TestingConfig
+from pluto.changeFeed import TAX_UPDATED, record_change
+from pluto.extensions import db
+from pluto.models import Tax, TaxRule, TaxRuleCountry
+from pluto.rateIndex import CompiledTax, load_compiled_taxes, rate_index
+from pluto.rateSnapshot import HEADER, INDEX_ENTRY, InvalidSnapshot, SnapshotFile, SnapshotTax, compile_snapshot
+
+COMPANY_ID = "rate-snapshot"
+# countries of the rules, unknown ones and ones a snapshot record cannot hold
+PROBES = [None, "", "DE", "AT", "FR", "CH", "ZZ", "É", "ÄD", "DE\0", "DEU", "DEUX", "ÄÖ", "ÄÖÜ"]
+
+
+class RateSnapshotTests(unittest.TestCase):
+    """The snapshot has to answer every lookup exactly like the compiled taxes of the database."""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "rates.snap")
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.database
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+            RATE_SNAPSHOT_PATH = self.path
+            RATE_SNAPSHOT_CHECK_INTERVAL = 0
+
+        self.app = create_app(Config)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+        self.taxes = {
+            "default only": self.add_tax(19, []),
+            "countries": self.add_tax(19, [(7, True, ["DE", "AT"]), (5, False, ["DE"]), (0, True, ["FR"])]),
+            "fallbacks": self.add_tax(20, [(10, True, []), (2.5, False, []), (7, True, ["DE"]), (8, True, ["É"])]),
+            "ambiguous": self.add_tax(21, [(1, True, []), (2, True, []), (3, False, ["DE"]), (6, False, ["AT"])]),
+            "three bytes": self.add_tax(16, [(3, True, ["DEU"]), (9, True, ["ÄD"])]),
+            "too long": self.add_tax(17, [(4, True, ["DEUX"]), (1, True, [])]),
+            "wide": self.add_tax(18, [(6, False, ["ÄÖ"])])
+        }
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.remove(self.database)
+        self.directory.cleanup()
+
+    def add_tax(self, default_tax, rules):
+        tax = Tax(COMPANY_ID, "VAT", default_tax)
+        db.session.add(tax)
+        db.session.flush()
+        for number, (value, b2c, countries) in enumerate(rules):
+            rule = TaxRule(tax.id, value, f"rule {number}", b2c_rule=b2c)
+            for country_id in countries:
+                rule.countries.append(TaxRuleCountry(country_id, tax.id, b2c))
+            db.session.add(rule)
+        db.session.commit()
+        return tax.tax_uuid
+
+    def lookup(self, tax_uuid):
+        return rate_index.get(tax_uuid, self.app.config.get("RATE_INDEX_TTL"), self.app.config.get("RATE_INDEX_SIZE"))
+
+    def test_resolve_matches_compiled_taxes(self):
+        compile_snapshot(self.path)
+        snapshot = SnapshotFile(self.path)
+        compiled = load_compiled_taxes(list(self.taxes.values()))
+
+        for name, tax_uuid in self.taxes.items():
+            snapshot_tax = snapshot.get(tax_uuid)
+            if name in ("too long", "wide"):
+                # left to the database
+                self.assertIsNone(snapshot_tax)
+                continue
+            self.assertEqual((snapshot_tax.company_id, snapshot_tax.default_tax),
+                             (compiled[tax_uuid].company_id, compiled[tax_uuid].default_tax))
+            for b2c in (True, False):
+                for country_id in PROBES:
+                    with self.subTest(tax=name, b2c=b2c, country=country_id):
+                        self.assertEqual(snapshot_tax.resolve(b2c, country_id),
+                                         compiled[tax_uuid].resolve(b2c, country_id))
+
+        self.assertIsNone(snapshot.get("unknown"))
+        self.assertEqual(snapshot.tax_count, len(self.taxes) - 2)
+
+    def test_rate_index_serves_snapshot(self):
+        compile_snapshot(self.path)
+        self.assertIsInstance(self.lookup(self.taxes["countries"]), SnapshotTax)
+        self.assertIsInstance(self.lookup(self.taxes["too long"]), CompiledTax)
+        self.assertEqual(self.lookup(self.taxes["too long"]).resolve(True, "DEUX")[0], 4)
+
+    def test_changes_after_snapshot_are_read_from_database(self):
+        compile_snapshot(self.path)
+        self.assertIsInstance(self.lookup(self.taxes["countries"]), SnapshotTax)
+
+        # written by another worker, this process is not told about it
+        tax = Tax.query.filter_by(tax_uuid=self.taxes["countries"]).one()
+        tax.default_tax = 25
+        record_change(COMPANY_ID, tax.tax_uuid, TAX_UPDATED)
+        db.session.commit()
+
+        changed = self.lookup(self.taxes["countries"])
+        self.assertIsInstance(changed, CompiledTax)
+        self.assertEqual(changed.resolve(True, "CH")[0], 25)
+        self.assertIsInstance(self.lookup(self.taxes["fallbacks"]), SnapshotTax)
+
+        # a new snapshot contains the change
+        compile_snapshot(self.path)
+        rate_index.clear()
+        self.assertIsInstance(self.lookup(self.taxes["countries"]), SnapshotTax)
+        self.assertEqual(self.lookup(self.taxes["countries"]).resolve(True, "CH")[0], 25)
+
+    def test_invalidated_taxes_are_read_from_database(self):
+        compile_snapshot(self.path)
+        self.assertIsInstance(self.lookup(self.taxes["fallbacks"]), SnapshotTax)
+
+        # written by this process before the change feed is read again
+        rate_index.snapshot.check_interval = 3600
+        tax = Tax.query.filter_by(tax_uuid=self.taxes["fallbacks"]).one()
+        tax.default_tax = 25
+        record_change(COMPANY_ID, tax.tax_uuid, TAX_UPDATED)
+        db.session.commit()
+        rate_index.invalidate(tax.tax_uuid)
+
+        changed = self.lookup(self.taxes["fallbacks"])
+        self.assertIsInstance(changed, CompiledTax)
+        self.assertEqual(changed.resolve(False, "DE")[0], 2.5)
+        self.assertEqual(changed.default_tax, 25)
+
+    def test_invalid_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"PLRS" + b"\0" * 100)
+        with self.assertRaises(InvalidSnapshot):
+            SnapshotFile(self.path)
+
+        compile_snapshot(self.path)
+        with open(self.path, "rb") as f:
+            strings_offset = HEADER.unpack(f.read(HEADER.size))[-1]
+        # cut into the header, the index and the records
+        for length in (HEADER.size - 1, HEADER.size + INDEX_ENTRY.size, strings_offset - 1):
+            with self.subTest(length=length):
+                compile_snapshot(self.path)
+                with open(self.path, "r+b") as f:
+                    f.truncate(length)
+                with self.assertRaises(InvalidSnapshot):
+                    SnapshotFile(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
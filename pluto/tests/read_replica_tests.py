@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from app import create_app
+from config import TestingConfig
+from pluto.extensions import db
+from pluto.models import ReplicaWriteMark, Tax
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+from pluto.readReplicas import LAST_WRITE_COOKIE, LAST_WRITE_HEADER
+
+COMPANY_ID = "read-replica"
+WRITER = {"x-user-id": "1", "x-user-uuid": "read-replica-writer", "x-transactionid": "read-replica-write"}
+OTHER = {"x-user-id": "2", "x-user-uuid": "read-replica-other", "x-transactionid": "read-replica-other"}
+
+
+class ReadReplicaTests(unittest.TestCase):
+    """Two app instances, standing in for two workers or hosts, share a primary and a lagging replica."""
+
+    def setUp(self):
+        self.primary = self.temporary_database()
+        self.replica = self.temporary_database()
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.primary
+            SQLALCHEMY_BINDS = {"replica_0": "sqlite:///" + self.replica}
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+
+        self.writer = create_app(Config)
+        self.reader = create_app(Config)
+        with self.writer.app_context():
+            db.create_all()
+            tax = Tax(COMPANY_ID, "VAT", 19)
+            db.session.add(tax)
+            db.session.commit()
+            self.tax_uuid = tax.tax_uuid
+            db.session.remove()
+        self.replicate()
+
+    def tearDown(self):
+        for path in (self.primary, self.replica):
+            os.remove(path)
+
+    def temporary_database(self):
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        return path
+
+    def replicate(self):
+        shutil.copy(self.primary, self.replica)
+
+    def request(self, client, method, path, body=None, headers=OTHER):
+        response = client.open(path, method=method, headers=headers,
+                               data=json.dumps(body) if body is not None else None, content_type="application/json",
+                               environ_base={PERMISSION_ENVIRON_KEY: None})
+        self.assertEqual(response.status_code, 200)
+        return response, json.loads(response.data.decode())
+
+    def edit_tax(self):
+        response, _ = self.request(self.writer.test_client(), "POST", f"/tax/edit/{COMPANY_ID}/{self.tax_uuid}",
+                                   {"tax_name": "VAT reduced", "default_tax": 7}, WRITER)
+        return response
+
+    def tax_name(self, client, headers=OTHER):
+        _, data = self.request(client, "GET", f"/tax/{self.tax_uuid}/{COMPANY_ID}", headers=headers)
+        return data["data"]["name"]
+
+    def test_write_is_sticky_on_other_instance(self):
+        self.edit_tax()
+
+        client = self.reader.test_client()
+        self.assertEqual(self.tax_name(client), "VAT")
+        # callers that only send the usual headers, no time of their write
+        self.assertEqual(self.tax_name(client, WRITER), "VAT reduced")
+        self.assertEqual(self.tax_name(client, dict(WRITER, **{"x-transactionid": "next"})), "VAT reduced")
+        self.assertEqual(self.tax_name(client, dict(OTHER, **{"x-transactionid": WRITER["x-transactionid"]})),
+                         "VAT reduced")
+
+    def test_marks_expire(self):
+        self.edit_tax()
+        with self.writer.app_context():
+            expired = datetime.datetime.utcnow() - datetime.timedelta(
+                seconds=self.writer.config.get("REPLICA_STICKY_SECONDS") + 1)
+            ReplicaWriteMark.query.update({ReplicaWriteMark.written_at: expired})
+            db.session.commit()
+            db.session.remove()
+
+        self.assertEqual(self.tax_name(self.reader.test_client(), WRITER), "VAT")
+
+        # the next write removes the expired marks
+        self.edit_tax()
+        with self.writer.app_context():
+            self.assertEqual(ReplicaWriteMark.query.filter(ReplicaWriteMark.written_at == expired).count(), 0)
+            self.assertEqual(ReplicaWriteMark.query.count(), 2)
+            db.session.remove()
+
+    def test_sent_write_is_sticky(self):
+        written = self.edit_tax().headers.get(LAST_WRITE_HEADER)
+        self.assertIsNotNone(written)
+
+        client = self.reader.test_client()
+        self.assertEqual(self.tax_name(client, dict(OTHER, **{LAST_WRITE_HEADER: written})), "VAT reduced")
+        expired = str(float(written) - self.reader.config.get("REPLICA_STICKY_SECONDS") - 1)
+        self.assertEqual(self.tax_name(client, dict(OTHER, **{LAST_WRITE_HEADER: expired})), "VAT")
+
+        client.set_cookie("localhost", LAST_WRITE_COOKIE, written)
+        self.assertEqual(self.tax_name(client), "VAT reduced")
+
+    def test_reads_without_write_use_replica(self):
+        client = self.reader.test_client()
+        response, _ = self.request(client, "GET", f"/tax/{self.tax_uuid}/{COMPANY_ID}")
+        self.assertNotIn(LAST_WRITE_HEADER, response.headers)
+        self.assertEqual(self.tax_name(client, dict(OTHER, **{LAST_WRITE_HEADER: "not a time"})), "VAT")
+        self.edit_tax()
+        self.assertEqual(self.tax_name(client, dict(OTHER, **{LAST_WRITE_HEADER: str(time.time() + 3600)})), "VAT")
+
+    def test_rate_index_is_loaded_from_primary(self):
+        self.edit_tax()
+
+        client = self.reader.test_client()
+        # the replica still has the old rate, the index of a read-only view must not pick it up
+        self.assertEqual(self.tax_name(client), "VAT")
+        _, data = self.request(client, "POST", f"/tax/test/{self.tax_uuid}/{COMPANY_ID}",
+                               {"tax_option": "b2c", "country": "DE"})
+        self.assertEqual(data["tax_rate"], 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
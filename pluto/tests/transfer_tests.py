@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from sqlalchemy import text
+
+from app import create_app
+from config import TestingConfig
+from pluto.extensions import db
+from pluto.models import Tax, TaxChange, TaxRule, TaxRuleCountry
+from pluto.permissionCache import PERMISSION_ENVIRON_KEY
+
+COMPANY_ID = "transfer"
+TARGET_COMPANY_ID = "transfer-target"
+HEADERS = {"x-user-id": "1", "x-user-uuid": "transfer-user", "x-transactionid": "transfer"}
+GEOSERVICE = "http://geo.test/countries"
+COUNTRIES = ["DE", "AT", "FR", "IT", "XX"]
+MAX_ERRORS = 3
+
+
+class TransferTests(unittest.TestCase):
+    """Export and import of the tax configuration of a company."""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = "sqlite:///" + self.database
+            LOG_QUEUE_ENABLED = False
+            WARMUP_ENABLED = False
+            GEOSERVICE = GEOSERVICE
+            IMPORT_CHUNK_SIZE = 2
+            IMPORT_MAX_ERRORS = MAX_ERRORS
+
+        self.app = create_app(Config)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        # the countries the geo service would answer with
+        catalog = self.app.extensions["country_catalog"]
+        catalog.url = GEOSERVICE
+        catalog.country_ids = frozenset(COUNTRIES)
+        catalog.fetched_at = time.time()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        os.remove(self.database)
+
+    def add_tax(self, name, default_tax, rules, company_id=COMPANY_ID):
+        tax = Tax(company_id, name, default_tax)
+        db.session.add(tax)
+        db.session.flush()
+        for rule_name, value, b2c, countries in rules:
+            rule = TaxRule(tax.id, value, rule_name, b2c_rule=b2c)
+            for country_id in countries:
+                rule.countries.append(TaxRuleCountry(country_id, tax.id, b2c))
+            db.session.add(rule)
+        db.session.commit()
+        return tax.tax_uuid
+
+    def configuration(self, company_id):
+        db.session.remove()
+        return sorted(
+            (tax.name, str(tax.default_tax), sorted(
+                (rule.tax_rule_name, str(rule.value), rule.b2c_rule, sorted(c.country_id for c in rule.countries))
+                for rule in tax.tax_rules
+            )) for tax in Tax.query.filter_by(company_id=company_id)
+        )
+
+    def export(self, export_format="ndjson"):
+        response = self.client.get(f"/tax/export/{COMPANY_ID}?format={export_format}", headers=HEADERS,
+                                   environ_base={PERMISSION_ENVIRON_KEY: None})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def import_document(self, document, status_code=200, content_type="application/x-ndjson"):
+        if isinstance(document, list):
+            document = "".join(json.dumps(record) + "\n" for record in document).encode()
+        response = self.client.post(f"/tax/import/{TARGET_COMPANY_ID}", headers=HEADERS, data=document,
+                                    content_type=content_type, environ_base={PERMISSION_ENVIRON_KEY: None})
+        self.assertEqual(response.status_code, status_code)
+        return json.loads(response.data.decode())
+
+    def test_round_trip(self):
+        self.add_tax("VAT", 19, [("reduced", 7, True, ["DE", "AT"]), ("export", 0, False, []),
+                                 ("reduced", 5, False, ["FR"])])
+        self.add_tax("empty", 0, [])
+        self.add_tax("services", 20, [("fallback", 10, True, [])])
+        self.add_tax("other company", 1, [], company_id="other")
+
+        data = self.import_document(self.export())
+        self.assertEqual(data["imported"], {"taxes": 3, "rules": 4, "countries": 3})
+        self.assertEqual(self.configuration(TARGET_COMPANY_ID), self.configuration(COMPANY_ID))
+        self.assertEqual(TaxChange.query.filter_by(company_id=TARGET_COMPANY_ID).count(), 3)
+        self.assertEqual(sorted(data["tax_ids"].values()),
+                         sorted(tax.tax_uuid for tax in Tax.query.filter_by(company_id=TARGET_COMPANY_ID)))
+
+    def test_rule_has_to_follow_its_tax(self):
+        data = self.import_document([
+            {"type": "rule", "tax_id": "a", "name": "r", "value": "1", "b2c_rule": True, "countries": []},
+            {"type": "tax", "tax_id": "a", "name": "A", "default_tax": "19"},
+            {"type": "tax", "tax_id": "b", "name": "B", "default_tax": "19"},
+            {"type": "rule", "tax_id": "a", "name": "r", "value": "1", "b2c_rule": True, "countries": []}
+        ], 400)
+        self.assertEqual(data["errors"], [{"line": 1, "message": "rule has to follow the tax it belongs to"},
+                                          {"line": 4, "message": "rule has to follow the tax it belongs to"}])
+
+    def test_duplicate_country(self):
+        data = self.import_document([
+            {"type": "tax", "tax_id": "a", "name": "A", "default_tax": "19"},
+            {"type": "rule", "tax_id": "a", "name": "r", "value": "1", "b2c_rule": True, "countries": ["DE"]},
+            {"type": "rule", "tax_id": "a", "name": "s", "value": "2", "b2c_rule": False, "countries": ["DE"]},
+            {"type": "rule", "tax_id": "a", "name": "t", "value": "3", "b2c_rule": True, "countries": ["AT", "DE"]}
+        ], 400)
+        self.assertEqual(data["errors"], [{"line": 4, "message": "country DE exists already with this settings"}])
+
+    def test_max_errors(self):
+        data = self.import_document(b"not json\n" * (MAX_ERRORS + 2), 400)
+        self.assertEqual(data["message"], "too many errors in import document")
+        self.assertEqual([error["line"] for error in data["errors"]], list(range(1, MAX_ERRORS + 1)))
+
+    def test_unknown_country(self):
+        data = self.import_document([
+            {"type": "tax", "tax_id": "a", "name": "A", "default_tax": "19"},
+            {"type": "rule", "tax_id": "a", "name": "r", "value": "1", "b2c_rule": True, "countries": ["DE", "ZZ"]}
+        ], 400)
+        self.assertEqual(data["country_ids"], ["ZZ"])
+        self.assertEqual(Tax.query.filter_by(company_id=TARGET_COMPANY_ID).count(), 0)
+
+    def test_failed_write_is_rolled_back(self):
+        # the database rejects a country of the last chunk, after the first chunks were written
+        db.session.execute(text(
+            "CREATE TRIGGER reject_country BEFORE INSERT ON rel_accounting_tax_rule_2_countries "
+            "WHEN NEW.country_id = 'XX' BEGIN SELECT RAISE(ABORT, 'country rejected'); END"))
+        db.session.commit()
+
+        self.import_document([
+            {"type": "tax", "tax_id": "a", "name": "A", "default_tax": "19"},
+            {"type": "rule", "tax_id": "a", "name": "r", "value": "1", "b2c_rule": True, "countries": ["DE"]},
+            {"type": "tax", "tax_id": "b", "name": "B", "default_tax": "19"},
+            {"type": "rule", "tax_id": "b", "name": "r", "value": "1", "b2c_rule": True, "countries": ["XX"]}
+        ], 409)
+        db.session.remove()
+        self.assertEqual(Tax.query.filter_by(company_id=TARGET_COMPANY_ID).count(), 0)
+        self.assertEqual(TaxRule.query.count(), 0)
+        self.assertEqual(TaxChange.query.count(), 0)
+
+    def test_csv_is_export_only(self):
+        self.add_tax("VAT", 19, [("reduced", 7, True, ["DE"])])
+        data = self.import_document(self.export("csv"), 415, content_type="text/csv")
+        self.assertEqual(data["message"], "csv is export only, please import the ndjson export")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,26 @@
-from flask import jsonify, request, Blueprint, Response, current_app as app
+from flask import request, Blueprint, Response, abort, stream_with_context, has_request_context, g, current_app as app
 from pluto.models import *
-from pluto.guardianClient import GuardianClient
+from pluto.fastJson import dumps, jsonify
+from pluto.guardianClient import GuardianClient, read_permission
 from pluto.geoClient import GeoServiceClient
+from pluto.rateIndex import rate_index
+from pluto import changeFeed
+from pluto.changeFeed import change_notifier, record_change, wait_for_changes
+from pluto.readReplicas import read_only, mark_write
+from pluto.permissionCache import permission_cache, PERMISSION_ENVIRON_KEY
+from pluto.authPool import get_executor
+from pluto.taxTransfer import export_ndjson, export_csv, validate_document, write_document
+from pluto.taxCalculation import ROUNDING_MODES, MAX_DECIMAL_PLACES, parse_items, calculate
+from pluto.exceptions.calculation_exceptions import InvalidCalculation
+from pluto.exceptions.change_feed_exceptions import TooManyWaiters
+from pluto.exceptions.transfer_exceptions import InvalidImportDocument
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+import requests
+import hashlib
+import math
+import tempfile
 import uuid
 import types
 
@@ -13,60 +32,184 @@ def test():
     return "pong"
 
 
-def _validate_request(user_uuid, company_id, transaction_id):
+def _get_transaction_id():
+    """The x-transactionid of the request, or a new one if the caller did not send it.
+
+    It is kept on flask.g, so hooks outside of the views log under the same id.
+    """
+    if "transaction_id" not in g:
+        transaction_id = request.headers.get("x-transactionid", "")
+        if not transaction_id:
+            app.logger.info("no transaction id header present")
+            transaction_id = str(uuid.uuid4())
+        g.transaction_id = transaction_id
+    return g.transaction_id
+
+
+def _rule_count():
+    """Correlated count of the rules of a tax, to be selected next to Tax."""
+    return db.session.query(func.count(TaxRule.id)).filter(TaxRule.tax_id == Tax.id).correlate(Tax).as_scalar()
+
+
+def _tax_summary(tax, rules):
+    return {
+        'name': tax.name,
+        'default_rate': int(tax.default_tax),
+        'default_rate_read': f"{tax.default_tax}%",
+        'rules': rules,
+        'tax_id': tax.tax_uuid
+    }
+
+
+def _bump_version(tax):
+    """Raises the version of the tax in the current transaction, called by every change to the tax or its rules."""
+    tax.version = Tax.version + 1
+
+
+def _etag(*parts):
+    """Strong ETag over the endpoint, its query string and the given parts."""
+    digest = hashlib.sha1(f"{request.endpoint}?{request.query_string.decode('latin-1')}".encode("utf-8"))
+    for part in parts:
+        digest.update(f":{part}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _matching_tax_etag(tax_id, company_id):
+    """The current ETag of the tax if the client already has it, looked up by its version alone."""
+    if not request.if_none_match:
+        return None
+    version = db.session.query(Tax.version).filter(Tax.tax_uuid == tax_id)\
+        .filter(Tax.company_id == company_id).scalar()
+    if version is None:
+        return None
+    etag = _etag(tax_id, version)
+    return etag if request.if_none_match.contains_weak(etag) else None
+
+
+def _not_modified(etag):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _conflicting_countries(tax_id, b2c, countries, exclude_tax_rule_id=None):
+    """All of the given countries already used by another rule of the tax with the same b2c option."""
+    query = db.session.query(TaxRuleCountry.country_id)\
+        .filter(TaxRuleCountry.tax_id == tax_id)\
+        .filter(TaxRuleCountry.b2c_rule == b2c)\
+        .filter(TaxRuleCountry.country_id.in_(countries))
+    if exclude_tax_rule_id is not None:
+        query = query.filter(TaxRuleCountry.tax_rule_id != exclude_tax_rule_id)
+
+    used = {country_id for country_id, in query}
+    return [country for country in countries if country in used]
+
+
+def _country_conflict(countries, transaction_id):
+    return jsonify(
+        status="ERROR",
+        status_code=400,
+        error_code=8000,
+        message="one of the country exists aleady with this settings",
+        country_id=countries[0],
+        country_ids=countries,
+        request_id=transaction_id
+    ), 400
+
+
+def _fetch_permission(user_uuid, company_id, transaction_id):
+    """Asks Guardian for the permission of the user.
+
+    Returns None if the user may access the company, otherwise the denial as a
+    (status_code, message, request id field) tuple.
+    """
     guardian_client = GuardianClient(app.config.get("GUARDIAN_SERVICE"), user_uuid, company_id)
-    response = guardian_client.get_user_permission()
-
-    if not response and response.status_code != 200:
-        app.logger.info(
-            f"{transaction_id}: got aborted transaction as answer from Guardian with status {response.status_code}")
-
-        if response.status_code == 401:
-            status_code = 401
-            message = "user has no permission"
-        elif response.status_code == 404:
-            status_code = 404
-            message = "resource does not exist"
-        else:
-            status_code = 500
-            message = "unkown error"
+    try:
+        response = guardian_client.get_user_permission()
+    except requests.RequestException as e:
+        app.logger.info(f"{transaction_id}: guardian is not reachable --> {e}")
+        return 503, "guardian service unavailable", "request_id"
 
-        return jsonify(
-            status="ERROR",
-            status_code=status_code,
-            message=message,
-            reques_id=transaction_id
-        ), status_code
+    return read_permission(response, app.logger, transaction_id)
 
-    data = response.json()
-    if "status" in data and data["status"] == "OK":
-        permission = data["data"]["user_permission"]
-        app.logger.info(f"{transaction_id}: successfully got user permission from guardian --> {permission}")
 
-        if not guardian_client.validate_permission(permission):
-            return jsonify(
-                status="ERROR",
-                status_code=401,
-                message="user has not the permission to create taxes",
-                request_id=transaction_id
-            ), 401
+def _check_permission(user_uuid, company_id, transaction_id, write=False):
+    if has_request_context() and PERMISSION_ENVIRON_KEY in request.environ:
+        # already asked by the asgi frontend without blocking a worker thread
+        return request.environ[PERMISSION_ENVIRON_KEY]
 
-    else:
-        app.logger.info(f"{transaction_id}: error during communication with guardian --> {response.json()}")
-        return jsonify(
-            status="ERROR",
-            status_code=500,
-            message="unkown response from guardian",
-            request_id=transaction_id
-        ), 500
+    bypass = write and app.config.get("PERMISSION_CACHE_BYPASS_WRITES")
+
+    if not bypass:
+        hit, denial = permission_cache.get(user_uuid, company_id)
+        if hit:
+            app.logger.debug(f"{transaction_id}: got user permission from cache")
+            return denial
+
+    denial = _fetch_permission(user_uuid, company_id, transaction_id)
+    permission_cache.store(user_uuid, company_id, denial, app.config)
+    return denial
+
+
+def _validate_request(user_uuid, company_id, transaction_id, write=False):
+    denial = _check_permission(user_uuid, company_id, transaction_id, write)
+    if denial is None:
+        return None
+    return _denial_response(denial, transaction_id)
+
+
+def _denial_response(denial, transaction_id):
+    status_code, message, id_field = denial
+    return jsonify(
+        status="ERROR",
+        status_code=status_code,
+        message=message,
+        **{id_field: transaction_id}
+    ), status_code
+
+
+def _check_permission_in_context(flask_app, user_uuid, company_id, transaction_id):
+    with flask_app.app_context():
+        return _check_permission(user_uuid, company_id, transaction_id)
+
+
+def _authorized_read(user_uuid, company_id, transaction_id, read):
+    """Runs the read of a GET endpoint while Guardian is asked for the permission.
+
+    Returns (validation, result) like _validate_request followed by read(). The permission is
+    checked on the auth pool and read() runs on the request thread in the meantime; its
+    result or error is only handed out once the user turned out to be allowed to see it.
+    """
+    hit, _ = permission_cache.get(user_uuid, company_id)
+    if hit or PERMISSION_ENVIRON_KEY in request.environ or not app.config.get("CONCURRENT_AUTH_ENABLED"):
+        validation = _validate_request(user_uuid, company_id, transaction_id)
+        if validation:
+            return validation, None
+        return None, read()
+
+    future = get_executor().submit(
+        _check_permission_in_context, app._get_current_object(), user_uuid, company_id, transaction_id)
+
+    error = None
+    try:
+        result = read()
+    except Exception as e:
+        # a 404 of the read must not tell an unauthorized user whether the tax exists
+        result, error = None, e
+
+    denial = future.result()
+    if denial is not None:
+        return _denial_response(denial, transaction_id), None
+
+    if error is not None:
+        raise error
+    return None, result
 
 
 @pluto.route("/test/<tax_id>/<company_id>", methods=["POST"])
+@read_only
 def test_tax_configuration(tax_id, company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to fetch all taxes")
 
@@ -85,7 +228,9 @@ def test_tax_configuration(tax_id, company_id):
     if validation:
         return validation
 
-    tax = Tax.query.filter_by(tax_uuid=tax_id).first_or_404()
+    compiled_tax = rate_index.get(tax_id, app.config.get("RATE_INDEX_TTL"), app.config.get("RATE_INDEX_SIZE"))
+    if compiled_tax is None:
+        abort(404)
 
     if not request.is_json and not request.json:
         app.logger.info(f"{transaction_id}: no json data submitted")
@@ -107,43 +252,37 @@ def test_tax_configuration(tax_id, company_id):
             status_code=400
         ), 400
 
+    if post_data["country"] is not None and not isinstance(post_data["country"], str):
+        app.logger.info(f"{transaction_id}: country is not a string")
+        return jsonify(
+            status="ERROR",
+            message="country has to be a country id",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
     if post_data["tax_option"] == "b2c":
         b2c = True
     else:
         b2c =False
 
-    tax_value = tax.default_tax
-    tax_name = ""
-
-    if len(tax.tax_rules) >= 1:
-        tx = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=b2c).join(TaxRuleCountry).filter(TaxRuleCountry.country_id==post_data["country"])
-        tx2 = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=b2c).filter(~TaxRule.countries.any())
-        if tx.count() == 1:
-            rate = tx.first()
-            tax_value = rate.value
-            tax_name = rate.tax_rule_name
-        elif tx2.count() == 1:
-            rate = tx2.first()
-            tax_value = rate.value
-            tax_name = rate.tax_rule_name
+    tax_value, tax_name = compiled_tax.resolve(b2c, post_data["country"])
 
     return jsonify(
         status="OK",
         status_code=200,
-        tax_rate=float(tax_value),
+        tax_rate=tax_value,
         tax=tax_name,
         request_id=transaction_id
     ), 200
 
 
-@pluto.route("/all/<company_id>")
-def fetch_all_taxes(company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+@pluto.route("/test/batch/<company_id>", methods=["POST"])
+@read_only
+def test_tax_configuration_batch(company_id):
+    transaction_id = _get_transaction_id()
 
-    app.logger.info(f"{transaction_id}: got new transaction to fetch all taxes")
+    app.logger.info(f"{transaction_id}: got new transaction to resolve a batch of tax rates")
 
     if "x-user-id" not in request.headers or "x-user-uuid" not in request.headers:
         app.logger.info(f"{transaction_id}: user id and user uuid header not present")
@@ -160,31 +299,266 @@ def fetch_all_taxes(company_id):
     if validation:
         return validation
 
+    post_data = request.get_json(silent=True)
+
+    if not isinstance(post_data, dict) or not isinstance(post_data.get("items"), list):
+        app.logger.info(f"{transaction_id}: not a valid batch request because of missing items")
+        return jsonify(
+            status="ERROR",
+            message="please submit a list of items as POST body",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    items = post_data["items"]
+    if len(items) > app.config.get("RATE_BATCH_MAX_ITEMS"):
+        return jsonify(
+            status="ERROR",
+            message=f"a batch can contain at most {app.config.get('RATE_BATCH_MAX_ITEMS')} items",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    tax_ids = {item["tax_id"] for item in items
+               if isinstance(item, dict) and isinstance(item.get("tax_id"), str)}
+    compiled_taxes = rate_index.get_many(tax_ids, app.config.get("RATE_INDEX_TTL"), app.config.get("RATE_INDEX_SIZE"))
+
     data = []
-    for tax in Tax.query.filter_by(company_id=company_id).all():
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("tax_id"), str) \
+                or "country" not in item or "tax_option" not in item:
+            data.append({
+                'status': "ERROR",
+                'status_code': 400,
+                'message': "please submit tax_id, country and tax_option"
+            })
+            continue
+
+        if item["country"] is not None and not isinstance(item["country"], str):
+            data.append({
+                'status': "ERROR",
+                'status_code': 400,
+                'message': "country has to be a country id",
+                'tax_id': item["tax_id"]
+            })
+            continue
+
+        compiled_tax = compiled_taxes.get(item["tax_id"])
+        if compiled_tax is None or compiled_tax.company_id != company_id:
+            data.append({
+                'status': "ERROR",
+                'status_code': 404,
+                'message': "requested tax does not exist",
+                'tax_id': item["tax_id"]
+            })
+            continue
+
+        b2c = item["tax_option"] == "b2c"
+        tax_value, tax_name = compiled_tax.resolve(b2c, item["country"])
         data.append({
-            'name': tax.name,
-            'default_rate': int(tax.default_tax),
-            'default_rate_read': f"{tax.default_tax}%",
-            'rules': len(tax.tax_rules),
-            'tax_id': tax.tax_uuid
+            'status': "OK",
+            'status_code': 200,
+            'tax_id': item["tax_id"],
+            'country': item["country"],
+            # the option the rate was resolved for, not what the client sent
+            'tax_option': "b2c" if b2c else "b2b",
+            'tax_rate': tax_value,
+            'tax': tax_name
         })
 
     return jsonify(
+        status="OK",
+        status_code=200,
+        message="successfully resolved tax rates",
+        data=data,
+        request_id=transaction_id
+    ), 200
+
+
+@pluto.route("/calculate/<company_id>", methods=["POST"])
+@read_only
+def calculate_taxes(company_id):
+    transaction_id = _get_transaction_id()
+
+    app.logger.info(f"{transaction_id}: got new transaction to calculate tax amounts")
+
+    if "x-user-id" not in request.headers or "x-user-uuid" not in request.headers:
+        app.logger.info(f"{transaction_id}: user id and user uuid header not present")
+        return jsonify(
+            status="ERROR",
+            message="please send your user as header",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    user_uuid = request.headers.get("x-user-uuid")
+
+    validation = _validate_request(user_uuid, company_id, transaction_id)
+    if validation:
+        return validation
+
+    post_data = request.get_json(silent=True)
+
+    if not isinstance(post_data, dict) or not isinstance(post_data.get("items"), list):
+        app.logger.info(f"{transaction_id}: not a valid calculation request because of missing items")
+        return jsonify(
+            status="ERROR",
+            message="please submit a list of items as POST body",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    items = post_data["items"]
+    if len(items) > app.config.get("CALCULATION_MAX_ITEMS"):
+        return jsonify(
+            status="ERROR",
+            message=f"a calculation can contain at most {app.config.get('CALCULATION_MAX_ITEMS')} items",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    decimal_places = post_data.get("decimal_places", app.config.get("CALCULATION_DECIMAL_PLACES"))
+    rounding = post_data.get("rounding", app.config.get("CALCULATION_ROUNDING"))
+    if isinstance(decimal_places, bool) or not isinstance(decimal_places, int) \
+            or not 0 <= decimal_places <= MAX_DECIMAL_PLACES or rounding not in ROUNDING_MODES:
+        return jsonify(
+            status="ERROR",
+            message=f"decimal_places has to be between 0 and {MAX_DECIMAL_PLACES} and rounding one of "
+                    f"{', '.join(ROUNDING_MODES)}",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    try:
+        lines = parse_items(items, app.config.get("CALCULATION_MAX_ERRORS"))
+        compiled_taxes = rate_index.get_many({tax_id for tax_id, _, _, _ in lines},
+                                             app.config.get("RATE_INDEX_TTL"), app.config.get("RATE_INDEX_SIZE"))
+        data, totals, total = calculate(lines, compiled_taxes, company_id, decimal_places, rounding)
+    except InvalidCalculation as e:
+        app.logger.info(f"{transaction_id}: {e.message}")
+        return jsonify(
+            status="ERROR",
+            message=e.message,
+            errors=e.errors,
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    return jsonify(
+        status="OK",
+        status_code=200,
+        message="successfully calculated tax amounts",
+        data=data,
+        totals=totals,
+        total=total,
+        request_id=transaction_id
+    ), 200
+
+
+@pluto.route("/all/<company_id>")
+@read_only
+def fetch_all_taxes(company_id):
+    transaction_id = _get_transaction_id()
+
+    app.logger.info(f"{transaction_id}: got new transaction to fetch all taxes")
+
+    if "x-user-id" not in request.headers or "x-user-uuid" not in request.headers:
+        app.logger.info(f"{transaction_id}: user id and user uuid header not present")
+        return jsonify(
+            status="ERROR",
+            message="please send your user as header",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    user_uuid = request.headers.get("x-user-uuid")
+
+    query = db.session.query(Tax, _rule_count()).filter(Tax.company_id == company_id).order_by(Tax.id)
+
+    if request.args.get("stream", "").lower() == "true":
+        validation = _validate_request(user_uuid, company_id, transaction_id)
+        if validation:
+            return validation
+        return Response(stream_with_context(_stream_taxes(query, transaction_id)), mimetype="application/json")
+
+    paginated = "limit" in request.args or "cursor" in request.args
+    if paginated:
+        try:
+            limit = min(int(request.args.get("limit", app.config.get("TAX_PAGE_SIZE"))),
+                        app.config.get("TAX_PAGE_SIZE_MAX"))
+            cursor = int(request.args.get("cursor", 0))
+        except ValueError:
+            limit = cursor = -1
+
+    def read():
+        versions = db.session.query(Tax.id, Tax.version).filter(Tax.company_id == company_id).order_by(Tax.id)
+        page = query
+        if paginated:
+            if limit < 1 or cursor < 0:
+                return None
+            versions = versions.filter(Tax.id > cursor).limit(limit + 1)
+            page = query.filter(Tax.id > cursor).limit(limit + 1)
+
+        if request.if_none_match:
+            etag = _etag(company_id, *versions.all())
+            if request.if_none_match.contains_weak(etag):
+                return etag, None
+
+        rows = page.all()
+        return _etag(company_id, *[(tax.id, tax.version) for tax, _ in rows]), rows
+
+    validation, result = _authorized_read(user_uuid, company_id, transaction_id, read)
+    if validation:
+        return validation
+
+    if result is None:
+        return jsonify(
+            status="ERROR",
+            message="limit and cursor have to be positive numbers",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    etag, rows = result
+    if rows is None:
+        return _not_modified(etag)
+
+    next_cursor = None
+    if paginated and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1][0].id)
+
+    data = [_tax_summary(tax, rules) for tax, rules in rows]
+
+    response = jsonify(
         status="OK",
         message="successfully fetched taxes",
         data=data,
+        next_cursor=next_cursor,
         status_code=200,
         transaction_id=transaction_id
     )
+    response.set_etag(etag)
+    return response
+
+
+def _stream_taxes(query, transaction_id):
+    """Writes the fetch_all_taxes payload piece by piece while reading the taxes from a server-side cursor."""
+    yield '{"status": "OK", "message": "successfully fetched taxes", "status_code": 200, ' \
+          f'"transaction_id": {dumps(transaction_id)}, "next_cursor": null, "data": ['
+
+    separator = ""
+    for tax, rules in query.execution_options(stream_results=True).yield_per(app.config.get("TAX_PAGE_SIZE")):
+        yield separator + dumps(_tax_summary(tax, rules))
+        separator = ", "
+
+    yield "]}"
 
 
 @pluto.route("/<tax_id>/<company_id>")
+@read_only
 def fetch_tax_by_id(tax_id, company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to fetch all taxes")
 
@@ -199,38 +573,39 @@ def fetch_tax_by_id(tax_id, company_id):
 
     user_uuid = request.headers.get("x-user-uuid")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    def read():
+        return db.session.query(Tax, _rule_count()).filter(Tax.tax_uuid == tax_id)\
+            .filter(Tax.company_id == company_id).first_or_404()
+
+    validation, row = _authorized_read(user_uuid, company_id, transaction_id, read)
     if validation:
         return validation
+
+    # the row is a single query either way, a match only saves building the response
+    etag = _etag(tax_id, row[0].version)
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    data = _tax_summary(*row)
     
-    tax = Tax.query.filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).first_or_404()
-    data = {
-        'name': tax.name,
-        'default_rate': int(tax.default_tax),
-        'default_rate_read': f"{tax.default_tax}%",
-        'rules': len(tax.tax_rules),
-        'tax_id': tax.tax_uuid
-    }
-    
-    return jsonify(
+    response = jsonify(
         status="OK",
         message="successfully fetched tax",
         data=data,
         status_code=200,
         transaction_id=transaction_id
     )
+    response.set_etag(etag)
+    return response
 
 
 @pluto.route("/rule/configuration/data/<tax_id>/<company_id>")
+@read_only
 def fetch_tax_configuration(tax_id, company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
+    transaction_id = _get_transaction_id()
 
     arg_tax_rule_id = request.args.get("tax_rule_id", False)
 
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
-
     app.logger.info(f"{transaction_id}: got new transaction to fetch all taxes")
 
     if "x-user-id" not in request.headers or "x-user-uuid" not in request.headers:
@@ -244,36 +619,41 @@ def fetch_tax_configuration(tax_id, company_id):
 
     user_uuid = request.headers.get("x-user-uuid")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    rule_join = TaxRule.tax_id == Tax.id
+    if arg_tax_rule_id:
+        rule_join = and_(rule_join, TaxRule.tax_rule_uuid != arg_tax_rule_id)
+
+    def read():
+        rows = db.session.query(Tax, TaxRule.id, TaxRule.b2c_rule, TaxRuleCountry.country_id)\
+            .outerjoin(TaxRule, rule_join)\
+            .outerjoin(TaxRuleCountry, TaxRuleCountry.tax_rule_id == TaxRule.id)\
+            .filter(Tax.tax_uuid == tax_id).filter(Tax.company_id == company_id)\
+            .order_by(TaxRule.id, TaxRuleCountry.id).all()
+        if not rows:
+            abort(404)
+        return rows
+
+    validation, rows = _authorized_read(user_uuid, company_id, transaction_id, read)
     if validation:
         return validation
 
-    tax = Tax.query.filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).first_or_404()
-
-    if arg_tax_rule_id:
-        tax_groups = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=False).filter(TaxRule.tax_rule_uuid != arg_tax_rule_id).all()
-        b2c_tax_groups = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=True).filter(TaxRule.tax_rule_uuid != arg_tax_rule_id).all()
-
-        b2c_without_countries = count = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=True).filter(TaxRule.tax_rule_uuid != arg_tax_rule_id).filter(~TaxRule.countries.any()).count()
-        rules_without_countries = count = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=False).filter(TaxRule.tax_rule_uuid != arg_tax_rule_id).filter(~TaxRule.countries.any()).count()
-    else:
-        tax_groups = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=False).all()
-        b2c_tax_groups = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=True).all()
-
-        b2c_without_countries = count = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=True).filter(
-            ~TaxRule.countries.any()).count()
-        rules_without_countries = count = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=False).filter(
-            ~TaxRule.countries.any()).count()
-
+    tax = rows[0][0]
+    b2c_without_countries = 0
+    rules_without_countries = 0
     forbidden_regular_countries = []
-    for rule in tax_groups:
-        for country in rule.countries:
-            forbidden_regular_countries.append(country.country_id)
-
     forbidden_b2c_countries = []
-    for rule in b2c_tax_groups:
-        for country in rule.countries:
-            forbidden_b2c_countries.append(country.country_id)
+    for _, rule_id, b2c_rule, country_id in rows:
+        if rule_id is None:
+            continue
+        if country_id is None:
+            if b2c_rule:
+                b2c_without_countries += 1
+            else:
+                rules_without_countries += 1
+        elif b2c_rule:
+            forbidden_b2c_countries.append(country_id)
+        else:
+            forbidden_regular_countries.append(country_id)
 
     data = {
         'name': tax.name,
@@ -296,11 +676,9 @@ def fetch_tax_configuration(tax_id, company_id):
 
 
 @pluto.route("/rules/<tax_id>/<company_id>")
+@read_only
 def fetch_tax_rules(tax_id, company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to fetch tax per id  with rules")
 
@@ -315,11 +693,22 @@ def fetch_tax_rules(tax_id, company_id):
 
     user_uuid = request.headers.get("x-user-uuid")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    def read():
+        etag = _matching_tax_etag(tax_id, company_id)
+        if etag:
+            return etag, None
+        tax = Tax.query.options(selectinload(Tax.tax_rules).selectinload(TaxRule.countries))\
+            .filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).first_or_404()
+        return _etag(tax_id, tax.version), tax
+
+    validation, result = _authorized_read(user_uuid, company_id, transaction_id, read)
     if validation:
         return validation
 
-    tax = Tax.query.filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).first_or_404()
+    etag, tax = result
+    if tax is None:
+        return _not_modified(etag)
+
     tax_data = {
         'name': tax.name,
         'default_rate': int(tax.default_tax),
@@ -339,7 +728,7 @@ def fetch_tax_rules(tax_id, company_id):
                 'rule_id': rule.tax_rule_uuid,
                 'name': rule.tax_rule_name,
                 'b2c_rule': rule.b2c_rule,
-                'rule': float(rule.value),
+                'rule': rule.value,
                 'human_rule': "{}%".format(rule.value),
                 'countries': countries
             })
@@ -348,7 +737,7 @@ def fetch_tax_rules(tax_id, company_id):
                 'rule_id': rule.tax_rule_uuid,
                 'name': rule.tax_rule_name,
                 'b2c_rule': rule.b2c_rule,
-                'rule': float(rule.value),
+                'rule': rule.value,
                 'human_rule': "{}%".format(rule.value),
                 'countries': countries
             })
@@ -356,21 +745,21 @@ def fetch_tax_rules(tax_id, company_id):
     tax_data["data"] = data
     tax_data["data_b2c"] = data_b2c
 
-    return jsonify(
+    response = jsonify(
         status="OK",
         message="successfully fetched tax",
         data=tax_data,
         status_code=200,
         transaction_id=transaction_id
     )
+    response.set_etag(etag)
+    return response
 
 
 @pluto.route("/rule/<tax_rule_id>/<tax_id>/<company_id>")
+@read_only
 def fetch_tax_rule_by_id(tax_rule_id, tax_id, company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to fetch tax per id  with rules")
 
@@ -385,17 +774,19 @@ def fetch_tax_rule_by_id(tax_rule_id, tax_id, company_id):
 
     user_uuid = request.headers.get("x-user-uuid")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    def read():
+        tax = Tax.query.filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).first_or_404()
+        return TaxRule.query.options(selectinload(TaxRule.countries))\
+            .filter_by(tax_id=tax.id).filter_by(tax_rule_uuid=tax_rule_id).first_or_404()
+
+    validation, tax_rule = _authorized_read(user_uuid, company_id, transaction_id, read)
     if validation:
         return validation
 
-    tax = Tax.query.filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).first_or_404()
-    tax_rule = TaxRule.query.filter_by(tax_id=tax.id).filter_by(tax_rule_uuid=tax_rule_id).first_or_404()
-
     data = {
         "tax_rule_name": tax_rule.tax_rule_name,
         "tax_rule_uuid": tax_rule.tax_rule_uuid,
-        "value": float(tax_rule.value),
+        "value": tax_rule.value,
         "b2c_rule": tax_rule.b2c_rule
     }
 
@@ -406,7 +797,7 @@ def fetch_tax_rule_by_id(tax_rule_id, tax_id, company_id):
     data = {
         "tax_rule_name": tax_rule.tax_rule_name,
         "tax_rule_uuid": tax_rule.tax_rule_uuid,
-        "value": float(tax_rule.value),
+        "value": tax_rule.value,
         "b2c_rule": tax_rule.b2c_rule,
         "countries": countries
     }
@@ -422,10 +813,7 @@ def fetch_tax_rule_by_id(tax_rule_id, tax_id, company_id):
 
 @pluto.route("/<tax_id>/create/rule/<company_id>", methods=["POST", "PUT"])
 def add_rule_to_tax(tax_id, company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to create rule for tax")
 
@@ -452,7 +840,7 @@ def add_rule_to_tax(tax_id, company_id):
 
     app.logger.info(f"{transaction_id}: successfully read userid and useruuid from request")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    validation = _validate_request(user_uuid, company_id, transaction_id, write=True)
     if validation:
         return validation
 
@@ -511,7 +899,16 @@ def add_rule_to_tax(tax_id, company_id):
             ), 400
 
         geo_client = GeoServiceClient(app.config.get("GEOSERVICE"))
-        validated_countries = geo_client.validate_countries(countries)
+        try:
+            validated_countries = geo_client.validate_countries(countries)
+        except requests.RequestException as e:
+            app.logger.info(f"{transaction_id}: geo service is not reachable --> {e}")
+            return jsonify(
+                status="ERROR",
+                message="geo service unavailable",
+                request_id=transaction_id,
+                status_code=503
+            ), 503
 
         if not validated_countries:
             return jsonify(
@@ -521,36 +918,44 @@ def add_rule_to_tax(tax_id, company_id):
                 status_code=400
             ), 400
 
+        given_tax_rule_id = given_tax_rule.id if request.method == "PUT" else None
+        conflicts = _conflicting_countries(tax.id, b2c, validated_countries, given_tax_rule_id)
+        if conflicts:
+            return _country_conflict(conflicts, transaction_id)
+
         if request.method == "PUT":
             given_tax_rule.value = post_data["value"]
             given_tax_rule.tax_rule_name = post_data["rule_name"]
             given_tax_rule.b2c_rule = b2c
             db.session.add(given_tax_rule)
 
-            for country in given_tax_rule.countries:
-                db.session.delete(country)
+            # removed before the new countries are inserted, they may contain the same ones again
+            TaxRuleCountry.query.filter_by(tax_rule_id=given_tax_rule.id).delete(synchronize_session=False)
+            db.session.expire(given_tax_rule, ["countries"])
+            tax_rule = given_tax_rule
         else:
             tax_rule = TaxRule(tax.id, post_data["value"], post_data["rule_name"], b2c)
             db.session.add(tax_rule)
 
         for country in validated_countries:
-            count = TaxRule.query.filter_by(tax_id=tax.id).filter_by(b2c_rule=b2c).filter(TaxRule.countries.any(country_id=country)).count()
-            if count == 0:
-                trc = TaxRuleCountry(country)
-                if request.method == "PUT":
-                    given_tax_rule.countries.append(trc)
-                else:
-                    tax_rule.countries.append(trc)
-            else:
-                return jsonify(
-                    status="ERROR",
-                    status_code=400,
-                    error_code=8000,
-                    message="one of the country exists aleady with this settings",
-                    country_id=country
-                ), 400
-
-        db.session.commit()
+            tax_rule.countries.append(TaxRuleCountry(country, tax.id, b2c))
+
+        _bump_version(tax)
+        try:
+            # flushes the rule, a country taken concurrently fails here or in the commit
+            record_change(company_id, tax.tax_uuid,
+                          changeFeed.RULE_UPDATED if request.method == "PUT" else changeFeed.RULE_CREATED,
+                          tax_rule.tax_rule_uuid)
+            db.session.commit()
+        except IntegrityError:
+            # a concurrent request took one of the countries in the meantime
+            db.session.rollback()
+            conflicts = _conflicting_countries(tax.id, b2c, validated_countries, given_tax_rule_id)
+            return _country_conflict(conflicts or validated_countries, transaction_id)
+
+        rate_index.invalidate(tax.tax_uuid)
+        change_notifier.notify()
+        mark_write(transaction_id, user_uuid, company_id)
         return jsonify(
             status="OK",
             status_code=200,
@@ -579,11 +984,18 @@ def add_rule_to_tax(tax_id, company_id):
                     db.session.delete(country)
 
                 given_tax_rule.countries = []
+                _bump_version(tax)
+                record_change(company_id, tax.tax_uuid, changeFeed.RULE_UPDATED, given_tax_rule.tax_rule_uuid)
                 db.session.commit()
             else:
                 tax_rule = TaxRule(tax.id, post_data["value"], post_data["rule_name"], b2c)
                 db.session.add(tax_rule)
+                _bump_version(tax)
+                record_change(company_id, tax.tax_uuid, changeFeed.RULE_CREATED, tax_rule.tax_rule_uuid)
                 db.session.commit()
+            rate_index.invalidate(tax.tax_uuid)
+            change_notifier.notify()
+            mark_write(transaction_id, user_uuid, company_id)
             return jsonify(
                 status="OK",
                 status_code=200,
@@ -602,10 +1014,7 @@ def add_rule_to_tax(tax_id, company_id):
 
 @pluto.route('/delete/<tax_id>/<company_id>', methods=['DELETE'])
 def delete_tax(tax_id, company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to create tax")
 
@@ -621,20 +1030,21 @@ def delete_tax(tax_id, company_id):
     user_id = request.headers.get("x-user-id")
     user_uuid = request.headers.get("x-user-uuid")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    validation = _validate_request(user_uuid, company_id, transaction_id, write=True)
 
-    app.logger.info(validation)
     if validation:
         return validation
 
-    tax = Tax.query.filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).first_or_404()
+    # rules and countries go with the tax through ON DELETE CASCADE
+    deleted = Tax.query.filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).delete(synchronize_session=False)
+    if not deleted:
+        abort(404)
 
-    for rule in tax.tax_rules:
-        for country in rule.countries:
-            db.session.delete(country)
-        db.session.delete(rule)
-    db.session.delete(tax)
+    record_change(company_id, tax_id, changeFeed.TAX_DELETED)
     db.session.commit()
+    rate_index.invalidate(tax_id)
+    change_notifier.notify()
+    mark_write(transaction_id, user_uuid, company_id)
 
     return jsonify(
         status="OK",
@@ -646,10 +1056,7 @@ def delete_tax(tax_id, company_id):
 
 @pluto.route('/delete/taxgroup/<tax_id>/<tax_group_id>/<company_id>', methods=['DELETE'])
 def delete_tax_group(tax_id, tax_group_id, company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to create tax")
 
@@ -665,20 +1072,23 @@ def delete_tax_group(tax_id, tax_group_id, company_id):
     user_id = request.headers.get("x-user-id")
     user_uuid = request.headers.get("x-user-uuid")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    validation = _validate_request(user_uuid, company_id, transaction_id, write=True)
 
-    app.logger.info(validation)
     if validation:
         return validation
 
     tax = Tax.query.filter_by(tax_uuid=tax_id).filter_by(company_id=company_id).first_or_404()
-    tax_rule = TaxRule.query.filter_by(tax_id=tax.id).filter_by(tax_rule_uuid=tax_group_id).first_or_404()
-
-    for country in tax_rule.countries:
-        db.session.delete(country)
+    deleted = TaxRule.query.filter_by(tax_id=tax.id).filter_by(tax_rule_uuid=tax_group_id)\
+        .delete(synchronize_session=False)
+    if not deleted:
+        abort(404)
 
-    db.session.delete(tax_rule)
+    _bump_version(tax)
+    record_change(company_id, tax_id, changeFeed.RULE_DELETED, tax_group_id)
     db.session.commit()
+    rate_index.invalidate(tax_id)
+    change_notifier.notify()
+    mark_write(transaction_id, user_uuid, company_id)
 
     return jsonify(
         status="OK",
@@ -690,10 +1100,7 @@ def delete_tax_group(tax_id, tax_group_id, company_id):
 
 @pluto.route("/create/<company_id>", methods=['POST'])
 def create_tax(company_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to create tax")
 
@@ -709,9 +1116,8 @@ def create_tax(company_id):
     user_id = request.headers.get("x-user-id")
     user_uuid = request.headers.get("x-user-uuid")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    validation = _validate_request(user_uuid, company_id, transaction_id, write=True)
 
-    app.logger.info(validation)
     if validation:
         return validation
 
@@ -728,7 +1134,10 @@ def create_tax(company_id):
         tax = Tax(company_id=company_id, name=request.json["tax_name"],
                   default_tax=request.json["default_tax"])
         db.session.add(tax)
+        record_change(company_id, tax.tax_uuid, changeFeed.TAX_CREATED)
         db.session.commit()
+        change_notifier.notify()
+        mark_write(transaction_id, user_uuid, company_id)
 
         return jsonify(
             status="OK",
@@ -748,10 +1157,7 @@ def create_tax(company_id):
 
 @pluto.route("/edit/<company_id>/<tax_id>", methods=['POST'])
 def edit_tax(company_id, tax_id):
-    transaction_id = request.headers.get("x-transactionid", "")
-    if not transaction_id:
-        app.logger.info("no transaction id header present")
-        transaction_id = str(uuid.uuid4())
+    transaction_id = _get_transaction_id()
 
     app.logger.info(f"{transaction_id}: got new transaction to edit tax")
 
@@ -767,9 +1173,8 @@ def edit_tax(company_id, tax_id):
     user_id = request.headers.get("x-user-id")
     user_uuid = request.headers.get("x-user-uuid")
 
-    validation = _validate_request(user_uuid, company_id, transaction_id)
+    validation = _validate_request(user_uuid, company_id, transaction_id, write=True)
 
-    app.logger.info(validation)
     if validation:
         return validation
 
@@ -788,8 +1193,13 @@ def edit_tax(company_id, tax_id):
 
         tax.name = request.json["tax_name"]
         tax.default_tax = request.json["default_tax"]
+        _bump_version(tax)
         db.session.add(tax)
+        record_change(company_id, tax_id, changeFeed.TAX_UPDATED)
         db.session.commit()
+        rate_index.invalidate(tax_id)
+        change_notifier.notify()
+        mark_write(transaction_id, user_uuid, company_id)
 
         return jsonify(
             status="OK",
@@ -806,5 +1216,210 @@ def edit_tax(company_id, tax_id):
     ), 400
 
 
+@pluto.route("/export/<company_id>", methods=["GET"])
+@read_only
+def export_taxes(company_id):
+    transaction_id = _get_transaction_id()
+
+    app.logger.info(f"{transaction_id}: got new transaction to export the tax configuration")
+
+    if "x-user-id" not in request.headers or "x-user-uuid" not in request.headers:
+        app.logger.info(f"{transaction_id}: user id and user uuid header not present")
+        return jsonify(
+            status="ERROR",
+            message="please send your user as header",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    user_uuid = request.headers.get("x-user-uuid")
+
+    validation = _validate_request(user_uuid, company_id, transaction_id)
+    if validation:
+        return validation
+
+    export_format = request.args.get("format", "ndjson")
+    yield_per = app.config.get("EXPORT_YIELD_PER")
+
+    if export_format == "ndjson":
+        lines, mimetype = export_ndjson(company_id, yield_per), "application/x-ndjson"
+    elif export_format == "csv":
+        lines, mimetype = export_csv(company_id, yield_per), "text/csv"
+    else:
+        return jsonify(
+            status="ERROR",
+            message="format has to be ndjson or csv",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    response = Response(stream_with_context(lines), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename=taxes-{company_id}.{export_format}"
+    response.headers["x-transactionid"] = transaction_id
+    return response
+
+
+@pluto.route("/import/<company_id>", methods=["POST"])
+def import_taxes(company_id):
+    """Imports an ndjson document as written by the ndjson export, all or nothing.
+
+    The csv export is for spreadsheets only, a csv body is answered with a 415.
+    """
+    transaction_id = _get_transaction_id()
+
+    app.logger.info(f"{transaction_id}: got new transaction to import a tax configuration")
+
+    if "x-user-id" not in request.headers or "x-user-uuid" not in request.headers:
+        app.logger.info(f"{transaction_id}: user id and user uuid header not present")
+        return jsonify(
+            status="ERROR",
+            message="please send your user as header",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    user_uuid = request.headers.get("x-user-uuid")
+
+    validation = _validate_request(user_uuid, company_id, transaction_id, write=True)
+    if validation:
+        return validation
+
+    if request.mimetype == "text/csv":
+        return jsonify(
+            status="ERROR",
+            message="csv is export only, please import the ndjson export",
+            request_id=transaction_id,
+            status_code=415
+        ), 415
+
+    with tempfile.SpooledTemporaryFile(max_size=app.config.get("IMPORT_SPOOL_MEMORY")) as spool:
+        try:
+            countries = validate_document(request.stream, spool, app.config.get("IMPORT_MAX_ERRORS"))
+        except InvalidImportDocument as e:
+            app.logger.info(f"{transaction_id}: {e.message}")
+            return jsonify(
+                status="ERROR",
+                message=e.message,
+                errors=e.errors,
+                request_id=transaction_id,
+                status_code=400
+            ), 400
+
+        if countries:
+            geo_client = GeoServiceClient(app.config.get("GEOSERVICE"))
+            try:
+                validated_countries = geo_client.validate_countries(list(countries)) or []
+            except requests.RequestException as e:
+                app.logger.info(f"{transaction_id}: geo service is not reachable --> {e}")
+                return jsonify(
+                    status="ERROR",
+                    message="geo service unavailable",
+                    request_id=transaction_id,
+                    status_code=503
+                ), 503
+
+            unknown_countries = sorted(countries.difference(validated_countries))
+            if unknown_countries:
+                return jsonify(
+                    status="ERROR",
+                    message="the submitted data is not valid",
+                    country_ids=unknown_countries,
+                    request_id=transaction_id,
+                    status_code=400
+                ), 400
+
+        spool.seek(0)
+        try:
+            written, tax_ids = write_document(company_id, spool, app.config.get("IMPORT_CHUNK_SIZE"))
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            app.logger.info(f"{transaction_id}: import was rejected by the database --> {e}")
+            return jsonify(
+                status="ERROR",
+                message="the import conflicts with the existing tax configuration",
+                request_id=transaction_id,
+                status_code=409
+            ), 409
+        change_notifier.notify()
+        mark_write(transaction_id, user_uuid, company_id)
+
+    app.logger.info(f"{transaction_id}: imported {written['taxes']} taxes and {written['rules']} rules")
+    return jsonify(
+        status="OK",
+        status_code=200,
+        message="successfully imported the tax configuration",
+        imported=written,
+        tax_ids=tax_ids,
+        request_id=transaction_id
+    ), 200
+
+
+@pluto.route("/changes/<company_id>", methods=["GET"])
+def fetch_changes(company_id):
+    transaction_id = _get_transaction_id()
+
+    app.logger.info(f"{transaction_id}: got new transaction to fetch the changes of a company")
+
+    if "x-user-id" not in request.headers or "x-user-uuid" not in request.headers:
+        app.logger.info(f"{transaction_id}: user id and user uuid header not present")
+        return jsonify(
+            status="ERROR",
+            message="please send your user as header",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
+
+    user_uuid = request.headers.get("x-user-uuid")
+
+    try:
+        since = int(request.args.get("since", 0))
+        limit = min(int(request.args.get("limit", app.config.get("CHANGE_FEED_PAGE_SIZE"))),
+                    app.config.get("CHANGE_FEED_PAGE_SIZE_MAX"))
+        wait = float(request.args.get("wait", 0))
+        if not math.isfinite(wait):
+            # nan passes the range check below and makes the long-poll fail
+            raise ValueError(wait)
+        wait = min(wait, app.config.get("CHANGE_FEED_MAX_WAIT"))
+    except ValueError:
+        since = limit = wait = -1
+
+    if since < 0 or limit < 1 or wait < 0:
+        return jsonify(
+            status="ERROR",
+            message="since, limit and wait have to be positive numbers",
+            request_id=transaction_id,
+            status_code=400
+        ), 400
 
+    validation = _validate_request(user_uuid, company_id, transaction_id)
+    if validation:
+        return validation
+
+    try:
+        changes = wait_for_changes(company_id, since, limit, wait, app.config)
+    except TooManyWaiters as e:
+        app.logger.warning(f"{transaction_id}: {e.message}")
+        response = jsonify(
+            status="ERROR",
+            message="too many requests are waiting for changes, retry later",
+            request_id=transaction_id,
+            status_code=503
+        )
+        response.headers["Retry-After"] = str(math.ceil(app.config.get("CHANGE_FEED_POLL_INTERVAL_MS") / 1000))
+        return response, 503
 
+    return jsonify(
+        status="OK",
+        message="successfully fetched changes",
+        data=[{
+            'sequence': change.id,
+            'action': change.action,
+            'tax_id': change.tax_uuid,
+            'rule_id': change.tax_rule_uuid,
+            'changed_at': change.created_at.isoformat() + "Z"
+        } for change in changes],
+        next_since=changes[-1].id if changes else since,
+        status_code=200,
+        transaction_id=transaction_id
+    )
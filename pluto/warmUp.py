@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import time
+from collections import OrderedDict
+
+from pluto.extensions import db
+from pluto.geoClient import country_catalog
+from pluto.models import Tax
+from pluto.rateIndex import rate_index
+
+WARM_UP_CHUNK = 500
+
+
+def _warm_up_countries(app):
+    country_catalog.get(app.config.get("GEOSERVICE"), app.config)
+
+
+def _warm_up_rates(app):
+    if rate_index.snapshot is not None:
+        # maps the snapshot and reads the taxes changed since it was compiled
+        rate_index.snapshot.get_many([])
+        return
+
+    tax_uuids = [tax_uuid for tax_uuid, in db.session.query(Tax.tax_uuid).order_by(Tax.id.desc())
+                 .limit(min(app.config.get("WARMUP_RATE_TAXES"), app.config.get("RATE_INDEX_SIZE")))]
+    for start in range(0, len(tax_uuids), WARM_UP_CHUNK):
+        rate_index.get_many(tax_uuids[start:start + WARM_UP_CHUNK], app.config.get("RATE_INDEX_TTL"),
+                            app.config.get("RATE_INDEX_SIZE"))
+
+
+def warm_up(app):
+    """Fills the country catalog and the rate index of this process before it takes traffic.
+
+    A failing step is logged and skipped, the caches then fill on the first requests as
+    before. Returns the seconds spent per step.
+    """
+    timings = OrderedDict()
+    with app.app_context():
+        for name, step in (("countries", _warm_up_countries), ("rates", _warm_up_rates)):
+            start = time.perf_counter()
+            try:
+                step(app)
+            except Exception as e:
+                app.logger.warning(f"warm-up of the {name} failed --> {e}")
+            timings[name] = time.perf_counter() - start
+
+        db.session.remove()
+        # a preloading server forks after this, its workers must not share these connections
+        db.engine.dispose()
+    return timings
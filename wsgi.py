@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+"""WSGI entry point, e.g. `gunicorn wsgi:app`, and the FLASK_APP of the flask commands."""
+import time
+_import_started = time.perf_counter()
+
+from app import create_app
+
+app = create_app()
+app.logger.info(f"started in {(time.perf_counter() - _import_started) * 1000:.0f}ms")